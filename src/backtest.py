@@ -0,0 +1,237 @@
+import argparse
+
+import numpy as np
+from pandas import DataFrame
+
+import data
+import elo
+import engine
+
+# smallest probability used in log-loss, so a confident miss doesn't score infinity
+EPSILON = 1e-15
+
+# the columns of the per-week score table
+SCORE_COLUMNS = ["games", "log_loss", "brier", "accuracy"]
+
+
+def score_batch(expected_h: np.ndarray, games: engine.GameArrays) -> np.ndarray:
+    """
+    Scores pre-game predictions against the results of a batch of games
+
+    Parameters:
+        expected_h: np.ndarray
+            the home team's pre-game expected score, (games,) or (variants x games)
+        games: engine.GameArrays
+            the batch of games
+
+    Returns:
+        the number of games and the summed log-loss, Brier score and correct picks,
+        shape (4,) or (4 x variants)
+    """
+    # ties count as away wins, like in elo.update_elo
+    home_won = games.home_points > games.away_points
+    p = np.clip(expected_h, EPSILON, 1 - EPSILON)
+
+    return np.stack(
+        [
+            np.full(expected_h.shape[:-1], len(home_won), dtype=np.float64),
+            -np.where(home_won, np.log(p), np.log1p(-p)).sum(axis=-1),
+            ((expected_h - home_won) ** 2).sum(axis=-1),
+            ((expected_h > 0.5) == home_won).sum(axis=-1),
+        ]
+    )
+
+
+def replay_scored(
+    state: engine.RatingState,
+    games: engine.GameArrays,
+    margin_of_victory: bool | np.ndarray,
+    names: list[str],
+    season: int,
+    rows: list[dict],
+) -> None:
+    """
+    Replays a season, appending one row of summed scores per variant and week to rows.
+    Nothing is kept per game, so memory doesn't grow with the number of games
+
+    Parameters:
+        state: engine.RatingState
+            the state to update in place, with one row of elo per name
+        games: engine.GameArrays
+            the season's games
+        margin_of_victory: bool | np.ndarray
+            whether each variant weights elo by margin of victory
+        names: list[str]
+            the name of each variant
+        season: int
+            the season being replayed
+        rows: list[dict]
+            where the per-week rows are appended
+    """
+    engine.reset_record(state)
+
+    for week_games in engine.iter_weeks(games):
+        totals = np.zeros((len(SCORE_COLUMNS), len(names)))
+
+        def on_batch(batch: engine.GameArrays, expected_h: np.ndarray) -> None:
+            totals[:] += score_batch(expected_h, batch)
+
+        engine.replay_week(state, week_games, margin_of_victory, on_batch=on_batch)
+
+        for name, variant_totals in zip(names, totals.T):
+            rows.append(
+                {
+                    "variant": name,
+                    "season": season,
+                    "week": week_games.week[0],
+                    **dict(zip(SCORE_COLUMNS, variant_totals)),
+                }
+            )
+
+
+def finish(scores_df: DataFrame) -> DataFrame:
+    """
+    Turns summed scores into per-game averages
+
+    Parameters:
+        scores_df: DataFrame
+            a df with summed log_loss, brier and accuracy columns and a games column
+
+    Returns:
+        the df with log_loss, brier and accuracy averaged over the games
+    """
+    scores_df = scores_df.copy()
+    for column in SCORE_COLUMNS[1:]:
+        scores_df[column] = scores_df[column] / scores_df["games"].clip(lower=1)
+    scores_df["games"] = scores_df["games"].astype(int)
+
+    return scores_df
+
+
+def backtest(
+    seasons: list[int] = None,
+    variants: dict[str, dict[str, bool]] = None,
+    cumulative: bool = True,
+) -> DataFrame:
+    """
+    Measures how well each rating system predicts games. Before every game is applied, the home
+    team's expected score from elo.update_elo is recorded as its win probability
+
+    Parameters:
+        seasons: list[int] = None
+            The seasons to test, defaults to the seasons of the cumulative rankings
+        variants: dict[str, dict[str, bool]] = None
+            The single-season rating systems to test by name, defaults to elo.VARIANTS
+        cumulative: bool = True
+            Also test the cumulative rating system (as "cum") over the same seasons
+
+    Returns:
+        A DataFrame of games, log-loss, Brier score and accuracy per variant, season and week
+    """
+    if seasons is None:
+        seasons = list(elo.build_season_list("all"))
+    if variants is None:
+        variants = elo.VARIANTS
+
+    recruiting = any(v.get("recruiting", False) for v in variants.values())
+    requests_list = elo.plan_requests("all", False)
+    for season in seasons:
+        requests_list += elo.plan_requests(str(season), recruiting)
+    data.prefetch(requests_list)
+
+    rows = []
+    names = list(variants)
+    margin_of_victory = np.array(
+        [[v.get("margin_of_victory", False)] for v in variants.values()]
+    )
+
+    # every season's recruiting averages come from one pass over the yearly classes
+    recruit_index = (
+        data.load_recruiting_index(min(seasons), max(seasons)) if recruiting else None
+    )
+
+    # the single-season systems all start over from their priors every season
+    for season in seasons:
+        teams_df = data.load_teams(season)
+        state = engine.init_state(teams_df)
+        state.elo = np.vstack(
+            [
+                elo.weight_teams_df(
+                    teams_df,
+                    v.get("conference", False),
+                    v.get("recruiting", False),
+                    season,
+                    recruit_index,
+                )["Elo"].to_numpy(dtype=np.float64)
+                for v in variants.values()
+            ]
+        )
+        games_df = elo.set_fcs(teams_df, data.load_games(season=season))
+        replay_scored(
+            state,
+            engine.encode_games(state, games_df),
+            margin_of_victory,
+            names,
+            season,
+            rows,
+        )
+
+    # the cumulative system carries ratings over from season to season
+    if cumulative:
+        teams_df = data.load_teams()
+        state = engine.init_state(teams_df)
+        state.elo = state.elo[None, :]
+        for season in seasons:
+            games_df = elo.set_fcs(teams_df, data.load_games(season=season))
+            replay_scored(
+                state,
+                engine.encode_games(state, games_df),
+                False,
+                ["cum"],
+                season,
+                rows,
+            )
+            engine.revert_state_to_mean(state)
+
+    return finish(
+        DataFrame(rows, columns=["variant", "season", "week"] + SCORE_COLUMNS)
+    )
+
+
+def summarize(weekly_df: DataFrame, by: list[str] = None) -> DataFrame:
+    """
+    Aggregates the per-week scores from backtest()
+
+    Parameters:
+        weekly_df: DataFrame
+            the result of backtest()
+        by: list[str] = None
+            the columns to aggregate by, e.g. ["variant"] for a single score per variant. Defaults
+            to ["variant", "season"]
+
+    Returns:
+        A DataFrame of games, log-loss, Brier score and accuracy per group
+    """
+    if by is None:
+        by = ["variant", "season"]
+
+    totals_df = weekly_df.copy()
+    for column in SCORE_COLUMNS[1:]:
+        totals_df[column] = totals_df[column] * totals_df["games"]
+
+    return finish(totals_df.groupby(by)[SCORE_COLUMNS].sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score how well each Elo rating system predicts past games"
+    )
+    parser.add_argument("--seasons", type=int, nargs="+", default=None)
+    parser.add_argument("--by", nargs="+", default=["variant"])
+    args = parser.parse_args()
+
+    print(summarize(backtest(seasons=args.seasons), by=args.by).to_string())
+
+
+if __name__ == "__main__":
+    main()
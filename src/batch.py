@@ -0,0 +1,128 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pandas import DataFrame
+
+import cache
+import data
+import elo
+import store
+
+
+def configure_worker(cache_dir: Path, offline: bool) -> None:
+    """
+    Points a worker process at the parent's cache, which matters when processes are spawned
+    rather than forked
+
+    Parameters:
+        cache_dir: Path
+            the parent's cache.CACHE_DIR
+        offline: bool
+            the parent's cache.OFFLINE
+    """
+    cache.CACHE_DIR = cache_dir
+    cache.OFFLINE = offline
+
+
+def rank_job(season: str, variant: str) -> DataFrame:
+    """
+    Ranks one season under one rating system, in a worker process
+
+    Parameters:
+        season: str
+            The season to get rankings for
+        variant: str
+            The rating system, a key of elo.VARIANTS
+
+    Returns:
+        The result of elo.get_elo_rankings
+    """
+    return elo.get_elo_rankings(season=season, **elo.VARIANTS[variant])
+
+
+def prepare(seasons: list[str], variants: list[str]) -> None:
+    """
+    Fetches everything the jobs need once, in the parent. Completed seasons go into the columnar
+    store, which every worker memory-maps instead of receiving a pickled copy, and everything
+    else lands in the response cache
+
+    Parameters:
+        seasons: list[str]
+            The seasons to get rankings for
+        variants: list[str]
+            The rating systems, keys of elo.VARIANTS
+    """
+    recruiting = any(elo.VARIANTS[v]["recruiting"] for v in variants)
+
+    requests_list = []
+    for season in seasons:
+        requests_list += elo.plan_requests(season, recruiting)
+    data.prefetch(requests_list)
+
+    store.ingest(sorted({int(season) for season in seasons}))
+
+
+def rank_seasons(
+    seasons: list[str],
+    variants: list[str] = None,
+    max_workers: int = None,
+) -> dict[tuple[str, str], DataFrame]:
+    """
+    Ranks many seasons under many single-season rating systems at once. Every (season, variant)
+    pair only depends on its own season's games and priors, so the pairs run as independent
+    jobs across a process pool
+
+    Parameters:
+        seasons: list[str]
+            The seasons to get rankings for
+        variants: list[str] = None
+            The rating systems, keys of elo.VARIANTS. Defaults to all of them
+        max_workers: int = None
+            how many processes to use, defaults to the number of CPUs
+
+    Returns:
+        A dict of ranking tables keyed by (season, variant)
+    """
+    if variants is None:
+        variants = list(elo.VARIANTS)
+
+    prepare(seasons, variants)
+
+    jobs = list(itertools.product(seasons, variants))
+
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers or os.cpu_count() or 1, len(jobs)),
+        initializer=configure_worker,
+        initargs=(cache.CACHE_DIR, cache.OFFLINE),
+    ) as executor:
+        results = executor.map(
+            rank_job,
+            [season for season, _ in jobs],
+            [variant for _, variant in jobs],
+        )
+        return dict(zip(jobs, results))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank several seasons under every rating system in parallel"
+    )
+    parser.add_argument("seasons", nargs="+")
+    parser.add_argument(
+        "--variants", nargs="+", choices=list(elo.VARIANTS), default=None
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    rankings = rank_seasons(args.seasons, args.variants, args.workers)
+
+    for (season, variant), rankings_df in rankings.items():
+        best = rankings_df.sort_values(by=["Elo"], ascending=False).iloc[0]
+        print(f"{season} {variant:8} {best['School']:30} {best['Elo']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
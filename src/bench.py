@@ -0,0 +1,233 @@
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+import cache
+import checkpoints
+import data
+import elo
+import engine
+import synthetic
+
+
+def measure(
+    fn: Callable[[], object], repeat: int, setup: Callable[[], object] = None
+) -> dict[str, float]:
+    """
+    Times a stage and measures its peak memory. The timing runs don't trace memory, so tracing
+    overhead doesn't leak into the timings
+
+    Parameters:
+        fn: Callable[[], object]
+            the stage to run
+        repeat: int
+            how many timed runs to make
+        setup: Callable[[], object] = None
+            run untimed before every run, e.g. to clear state an earlier run left behind
+
+    Returns:
+        the best and mean run time in seconds and the peak traced memory in MB
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "best_seconds": min(times),
+        "mean_seconds": sum(times) / len(times),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def replay_seasons(
+    teams_df, season_games: list[engine.GameArrays]
+) -> engine.RatingState:
+    """
+    Replays seasons back to back the way the cumulative rankings do
+
+    Parameters:
+        teams_df: DataFrame
+            the teams df
+        season_games: list[engine.GameArrays]
+            the encoded games of each season
+
+    Returns:
+        the final state
+    """
+    state = engine.init_state(teams_df)
+    for games in season_games:
+        engine.reset_record(state)
+        for week_games in engine.iter_weeks(games):
+            engine.replay_week(state, week_games)
+        engine.revert_state_to_mean(state)
+    return state
+
+
+def clear_checkpoints() -> None:
+    """
+    Deletes every season checkpoint, so the next get_elo_rankings call replays every game instead
+    of restoring an earlier run's result
+    """
+    shutil.rmtree(cache.CACHE_DIR / checkpoints.CHECKPOINT_SUBDIR, ignore_errors=True)
+
+
+def legacy_replay(teams_df, games_df) -> None:
+    """
+    Replays one season through the DataFrame-based elo.process_week_games, as a baseline
+
+    Parameters:
+        teams_df: DataFrame
+            the teams df
+        games_df: DataFrame
+            the season's games, after elo.set_fcs
+    """
+    teams_df = teams_df.copy()
+    for week in games_df.week.unique():
+        teams_df = elo.process_week_games(teams_df, games_df[games_df.week == week])
+
+
+def git_commit() -> str:
+    """
+    Gets the current git commit, so results can be compared between commits
+
+    Returns:
+        the commit hash, or "unknown" outside a git checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(num_seasons: int, num_teams: int, repeat: int, seed: int) -> dict:
+    """
+    Runs every benchmark stage against synthetic data in a throwaway offline cache
+
+    Parameters:
+        num_seasons: int
+            how many seasons of history to generate (at least the 9 of the cumulative rankings)
+        num_teams: int
+            how many FBS teams to generate, at least 130
+        repeat: int
+            how many timed runs to make per stage
+        seed: int
+            the random seed of the synthetic data
+
+    Returns:
+        the benchmark results
+    """
+    last_season = data.MOST_RECENT_FULL_SEASON
+    seasons = list(range(last_season - max(num_seasons, 10) + 1, last_season + 1))
+
+    cache.CACHE_DIR = Path(tempfile.mkdtemp(prefix="cfb_bench_"))
+    cache.OFFLINE = True
+    payload_bytes = synthetic.populate_cache(seasons, num_teams, seed)
+
+    stages = {}
+    stages["load_teams"] = measure(lambda: data.load_teams(last_season), repeat)
+    stages["load_games"] = measure(lambda: data.load_games(last_season), repeat)
+    stages["load_recruiting"] = measure(
+        lambda: data.load_recruiting(last_season), repeat
+    )
+
+    teams_df = data.load_teams()
+    games_dfs = [data.load_games(season) for season in seasons]
+    stages["set_fcs"] = measure(
+        lambda: [elo.set_fcs(teams_df, games_df) for games_df in games_dfs], repeat
+    )
+
+    games_dfs = [elo.set_fcs(teams_df, games_df) for games_df in games_dfs]
+    stages["process_week_games_one_season"] = measure(
+        lambda: legacy_replay(teams_df, games_dfs[-1]), 1
+    )
+
+    state = engine.init_state(teams_df)
+    season_games = [engine.encode_games(state, games_df) for games_df in games_dfs]
+    stages["engine_replay_all_seasons"] = measure(
+        lambda: replay_seasons(teams_df, season_games), repeat
+    )
+
+    # every get_elo_rankings run starts without checkpoints, so it times the replay
+    for name, variant in elo.VARIANTS.items():
+        stages[f"get_elo_rankings_{name}"] = measure(
+            lambda: elo.get_elo_rankings(str(last_season), **variant),
+            repeat,
+            setup=clear_checkpoints,
+        )
+    stages["get_elo_rankings_variants"] = measure(
+        lambda: elo.get_elo_rankings_variants(str(last_season)), repeat
+    )
+    stages["get_elo_rankings_all"] = measure(
+        lambda: elo.get_elo_rankings("all"), repeat, setup=clear_checkpoints
+    )
+
+    # resuming from the season checkpoints the last run left behind
+    stages["get_elo_rankings_all_restore"] = measure(
+        lambda: elo.get_elo_rankings("all"), repeat
+    )
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {
+            "seasons": len(seasons),
+            "teams": num_teams,
+            "games": sum(len(games.home) for games in season_games),
+            "payload_mb": payload_bytes / 2**20,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the data loaders and rating engine on synthetic data, offline"
+    )
+    parser.add_argument("--seasons", type=int, default=10)
+    parser.add_argument("--teams", type=int, default=130)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_output.json")
+    args = parser.parse_args()
+
+    results = run(args.seasons, args.teams, args.repeat, args.seed)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for name, stage in results["stages"].items():
+        print(
+            f"{name:40} {stage['best_seconds'] * 1000:10.1f} ms {stage['peak_mb']:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
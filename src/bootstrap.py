@@ -0,0 +1,277 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import data
+import elo
+import engine
+import simulate
+
+# how many resampled seasons each worker task replays at once
+CHUNK_SIZE = 250
+
+
+def load_season(
+    season: int,
+    conference: bool = False,
+    recruiting: bool = False,
+) -> tuple[DataFrame, engine.RatingState, engine.GameArrays]:
+    """
+    Loads a season's priors and played games
+
+    Parameters:
+        season: int
+            the season
+        conference: bool = False
+            Optionally weight elo by conference
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+
+    Returns:
+        the teams, the state before the first game and the encoded games
+    """
+    data.prefetch(elo.plan_requests(str(season), recruiting))
+    teams_df = elo.build_teams_df(str(season), conference, recruiting)
+    state = engine.init_state(teams_df)
+
+    games_df = elo.set_fcs(teams_df, data.load_games(season=season))
+    return teams_df, state, engine.encode_games(state, games_df)
+
+
+def batch_positions(games: engine.GameArrays) -> list[np.ndarray]:
+    """
+    Splits a season into the same conflict-free batches engine.replay_week processes, by position,
+    so per-game data can follow each game into its batch
+
+    Parameters:
+        games: engine.GameArrays
+            the season's games
+
+    Returns:
+        the positions of every batch's games, in replay order
+    """
+    codes, weeks = pd.factorize(games.week)
+
+    batches = []
+    for week in range(len(weeks)):
+        week_idx = np.flatnonzero(codes == week)
+        levels = engine.conflict_free_levels(engine.take_games(games, week_idx))
+        for level in range(levels.max() + 1):
+            batches.append(week_idx[levels == level])
+
+    return batches
+
+
+def resample_chunk(
+    state: engine.RatingState,
+    games: engine.GameArrays,
+    counts: np.ndarray,
+    margin_of_victory: bool = False,
+) -> np.ndarray:
+    """
+    Replays many resampled seasons at once, each carrying its own ratings through the schedule.
+    A game drawn more than once is played that many times in a row in its usual week, and a game
+    that wasn't drawn is skipped
+
+    Parameters:
+        state: engine.RatingState
+            the ratings before the first game
+        games: engine.GameArrays
+            the season's games
+        counts: np.ndarray
+            how many times each resample draws each game (runs x games)
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+
+    Returns:
+        every team's end-of-season Elo in every resample, after mean reversion (runs x teams)
+    """
+    # the records aren't part of the ratings, so the resamples share one throwaway copy
+    resampled = engine.RatingState(
+        team_ids=state.team_ids,
+        elo=np.tile(state.elo, (len(counts), 1)),
+        wins=np.zeros_like(state.wins),
+        losses=np.zeros_like(state.losses),
+    )
+    elo_ratings = resampled.elo
+
+    for batch_idx in batch_positions(games):
+        batch_counts = counts[:, batch_idx]
+        for repeat in range(batch_counts.max()):
+            played = batch_counts > repeat
+            # only the games some resample still has to play
+            keep = played.any(axis=0)
+            batch = engine.take_games(games, batch_idx[keep])
+            played = played[:, keep]
+
+            home_before = elo_ratings[:, batch.home]
+            away_before = elo_ratings[:, batch.away]
+            engine.update_batch(resampled, batch, margin_of_victory)
+            elo_ratings[:, batch.home] = np.where(
+                played, elo_ratings[:, batch.home], home_before
+            )
+            elo_ratings[:, batch.away] = np.where(
+                played, elo_ratings[:, batch.away], away_before
+            )
+
+    # the same season-end mean reversion as elo.get_elo_rankings
+    return engine.revert_state_to_mean(resampled).elo
+
+
+def rank_rows(elo_ratings: np.ndarray) -> np.ndarray:
+    """
+    Ranks the teams within every resample, tied teams sharing the best rank
+
+    Parameters:
+        elo_ratings: np.ndarray
+            every team's Elo in every resample (runs x teams)
+
+    Returns:
+        every team's rank in every resample, 1 is the best (runs x teams)
+    """
+    runs, num_teams = elo_ratings.shape
+
+    # shift each row far past the others so one sorted search ranks every row at once
+    shifted = -elo_ratings + (np.arange(runs)[:, np.newaxis] * 1e6)
+    ordered = np.sort(shifted, axis=1).ravel()
+    ranks = np.searchsorted(ordered, shifted.ravel(), side="left").reshape(runs, -1)
+
+    return (ranks - (np.arange(runs)[:, np.newaxis] * num_teams) + 1).astype(np.int16)
+
+
+def run_chunk(
+    state: engine.RatingState,
+    games: engine.GameArrays,
+    runs: int,
+    seed: np.random.SeedSequence,
+    margin_of_victory: bool,
+    is_team: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Draws and replays one chunk of bootstrap resamples, for the process pool. Every resample draws
+    as many games as the season has, with replacement
+
+    Parameters:
+        state: engine.RatingState
+            the ratings before the first game
+        games: engine.GameArrays
+            the season's games
+        runs: int
+            how many resamples to replay
+        seed: np.random.SeedSequence
+            the random seed of this chunk
+        margin_of_victory: bool
+            Optionally weight elo by margin of victory
+        is_team: np.ndarray
+            which entries are real teams rather than the FCS placeholder, only they are ranked
+
+    Returns:
+        every real team's Elo and rank in every resample, (runs x real teams) each
+    """
+    rng = np.random.default_rng(seed)
+    num_games = len(games.home)
+    counts = rng.multinomial(num_games, np.full(num_games, 1 / num_games), size=runs)
+
+    elo_ratings = resample_chunk(state, games, counts, margin_of_victory)[:, is_team]
+    return elo_ratings, rank_rows(elo_ratings)
+
+
+def bootstrap_season(
+    season: int,
+    conference: bool = False,
+    recruiting: bool = False,
+    margin_of_victory: bool = False,
+    runs: int = 2_000,
+    confidence: float = 0.95,
+    seed: int = None,
+    max_workers: int = None,
+) -> DataFrame:
+    """
+    Estimates how much every team's rating and rank owe to which games happened to be played, by
+    replaying many bootstrap resamples of the season's games
+
+    Parameters:
+        season: int
+            the season
+        conference: bool = False
+            Optionally weight elo by conference
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+        runs: int = 2_000
+            how many resamples to replay
+        confidence: float = 0.95
+            the share of resamples each interval covers
+        seed: int = None
+            the random seed, for reproducible intervals
+        max_workers: int = None
+            how many processes to use, defaults to the number of CPUs
+
+    Returns:
+        the rankings with percentile intervals for every team's Elo and rank, best Elo first
+    """
+    teams_df, state, games = load_season(season, conference, recruiting)
+    is_team = np.asarray(teams_df.index != 9999)
+
+    results = simulate.map_chunks(
+        run_chunk,
+        state,
+        games,
+        runs,
+        CHUNK_SIZE,
+        seed,
+        max_workers,
+        margin_of_victory,
+        is_team,
+    )
+
+    elo_ratings = np.concatenate([result[0] for result in results])
+    ranks = np.concatenate([result[1] for result in results])
+
+    # the actual season, for the point estimates
+    for week_games in engine.iter_weeks(games):
+        engine.replay_week(state, week_games, margin_of_victory)
+    engine.revert_state_to_mean(state)
+    rankings_df = engine.state_to_df(state, teams_df)[is_team]
+
+    tails = [(1 - confidence) / 2, (1 + confidence) / 2]
+    elo_low, elo_high = np.quantile(elo_ratings, tails, axis=0)
+    rank_low, rank_high = np.quantile(ranks, tails, axis=0, method="inverted_cdf")
+
+    intervals_df = rankings_df[["School", "Conference", "Wins", "Losses", "Elo"]].copy()
+    intervals_df["Elo Low"] = elo_low
+    intervals_df["Elo High"] = elo_high
+    intervals_df["Rank"] = rank_rows(rankings_df["Elo"].to_numpy()[np.newaxis, :])[0]
+    intervals_df["Best Rank"] = rank_low
+    intervals_df["Worst Rank"] = rank_high
+
+    return intervals_df.sort_values(by=["Elo"], ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Put confidence intervals on a season's Elo ratings and ranks"
+    )
+    parser.add_argument("--season", type=int, default=data.MOST_RECENT_FULL_SEASON)
+    parser.add_argument("--variant", choices=list(elo.VARIANTS), default="reg")
+    parser.add_argument("--runs", type=int, default=2_000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    intervals_df = bootstrap_season(
+        args.season,
+        runs=args.runs,
+        confidence=args.confidence,
+        seed=args.seed,
+        **elo.VARIANTS[args.variant],
+    )
+
+    print(intervals_df.head(25).to_string())
+
+
+if __name__ == "__main__":
+    main()
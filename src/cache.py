@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import metrics
+
+# where cached API responses are stored
+CACHE_DIR = Path(
+    os.getenv("CFB_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache")
+)
+
+# how long (in seconds) responses for a season that is still in progress stay fresh
+CURRENT_SEASON_TTL = int(os.getenv("CFB_CACHE_TTL", 6 * 60 * 60))
+
+# only serve responses from the cache, never call the API
+OFFLINE = os.getenv("CFB_OFFLINE", "0") == "1"
+
+stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+class CacheMissError(Exception):
+    """
+    Raised in offline mode when a response is not in the cache
+    """
+
+
+def make_key(endpoint: str, params: dict[str, str]) -> str:
+    """
+    Builds the cache key for a request
+    Params:
+        endpoint: str
+            the API endpoint
+        params: dict[str, str]
+            a dictionary of request parameters
+    Returns:
+        a string that is the same for every request of the same endpoint with the same params
+    """
+    return (
+        endpoint
+        + "?"
+        + json.dumps({k: str(v) for k, v in params.items()}, sort_keys=True)
+    )
+
+
+def season_completed_at(season: int) -> float:
+    """
+    Finds when a season is over, in which case its data never changes
+    Params:
+        season: int
+            the season
+    Returns:
+        the unix time after which every game of the season (bowls included) has been played
+    """
+    # bowls run into January, so a season is only over once the February after it is done
+    return datetime(season + 1, 3, 1).timestamp()
+
+
+def is_completed_season(season: int) -> bool:
+    """
+    Checks whether a season is over, in which case its data never changes
+    Params:
+        season: int
+            the season to check
+    Returns:
+        True if every game of the season (bowls included) has been played
+    """
+    return time.time() >= season_completed_at(season)
+
+
+def is_fresh(params: dict[str, str], fetched_at: float) -> bool:
+    """
+    Checks whether a cached response can still be served
+    Params:
+        params: dict[str, str]
+            the request parameters of the cached response
+        fetched_at: float
+            the unix time the response was fetched at
+    Returns:
+        True if the response was fetched after its season was over or is younger than
+        CURRENT_SEASON_TTL
+    """
+    # a response fetched while the season was still going is missing its last games
+    if "year" in params and fetched_at >= season_completed_at(int(params["year"])):
+        return True
+    return time.time() - fetched_at < CURRENT_SEASON_TTL
+
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """
+    Opens the cache database, creating it if needed, and commits and closes it afterwards.
+    Every call gets its own connection so the cache can be used from several threads at once
+    Returns:
+        a connection to the cache database
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(CACHE_DIR / "cfb_api.sqlite", timeout=30)
+    try:
+        with con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS responses"
+                " (key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, payload BLOB NOT NULL)"
+            )
+            yield con
+    finally:
+        con.close()
+
+
+def count(stat: str) -> None:
+    """
+    Increments one of the hit/miss counters
+    Params:
+        stat: str
+            either "hits" or "misses"
+    """
+    with _stats_lock:
+        stats[stat] += 1
+    metrics.incr(f"cache_{stat}")
+
+
+def get(endpoint: str, params: dict[str, str]) -> str | None:
+    """
+    Looks up a cached API response
+    Params:
+        endpoint: str
+            the API endpoint
+        params: dict[str, str]
+            a dictionary of request parameters
+    Returns:
+        the raw JSON text of the response, or None if it is not cached or has expired
+    Raises:
+        CacheMissError if the response is not available and OFFLINE is set
+    """
+    with connect() as con:
+        row = con.execute(
+            "SELECT fetched_at, payload FROM responses WHERE key = ?",
+            (make_key(endpoint, params),),
+        ).fetchone()
+
+    if row is not None and (OFFLINE or is_fresh(params, row[0])):
+        count("hits")
+        return zlib.decompress(row[1]).decode("utf-8")
+
+    count("misses")
+    if OFFLINE:
+        raise CacheMissError(
+            f"offline mode: no cached response for {make_key(endpoint, params)}"
+        )
+    return None
+
+
+def put(endpoint: str, params: dict[str, str], payload: str) -> None:
+    """
+    Stores an API response in the cache
+    Params:
+        endpoint: str
+            the API endpoint
+        params: dict[str, str]
+            a dictionary of request parameters
+        payload: str
+            the raw JSON text of the response
+    """
+    with connect() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+            (
+                make_key(endpoint, params),
+                time.time(),
+                zlib.compress(payload.encode("utf-8")),
+            ),
+        )
+
+
+def invalidate(endpoint: str, params: dict[str, str]) -> None:
+    """
+    Drops a cached API response, so the next request fetches it again
+    Params:
+        endpoint: str
+            the API endpoint
+        params: dict[str, str]
+            a dictionary of request parameters
+    """
+    with connect() as con:
+        con.execute(
+            "DELETE FROM responses WHERE key = ?", (make_key(endpoint, params),)
+        )
+
+
+def reset_stats() -> None:
+    """
+    Sets the hit/miss counters back to 0
+    """
+    with _stats_lock:
+        stats["hits"] = 0
+        stats["misses"] = 0
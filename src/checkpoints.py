@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import cache
+import engine
+
+# season-end rating checkpoints are stored in this subdirectory of the cache directory
+CHECKPOINT_SUBDIR = "checkpoints"
+
+
+def initial_key(
+    state: engine.RatingState,
+    margin_of_victory: bool,
+    k: float = engine.K,
+    reversion: float = engine.REVERSION,
+) -> str:
+    """
+    Builds the key that identifies a replay's configuration. The starting ratings are hashed
+    directly, so any change to the conference or recruiting priors gives a different key
+
+    Parameters:
+        state: engine.RatingState
+            the state before any games are processed
+        margin_of_victory: bool
+            whether elo is weighted by margin of victory
+        k: float = engine.K
+            the K factor
+        reversion: float = engine.REVERSION
+            the mean reversion factor applied at the end of each season
+    Returns:
+        a hex digest
+    """
+    config = json.dumps(
+        {
+            "margin_of_victory": bool(margin_of_victory),
+            "k": k,
+            "mov_scale": engine.MOV_SCALE,
+            "mov_slope": engine.MOV_SLOPE,
+            "reversion": reversion,
+        },
+        sort_keys=True,
+    )
+
+    digest = hashlib.sha256(config.encode("utf-8"))
+    for array in [state.team_ids, state.elo, state.wins, state.losses]:
+        digest.update(np.ascontiguousarray(array).tobytes())
+
+    return digest.hexdigest()
+
+
+def season_key(previous_key: str, season: int, games: engine.GameArrays) -> str:
+    """
+    Builds the key of the checkpoint taken at the end of a season. Each key chains the previous
+    one, so changing any earlier season's games invalidates every later checkpoint
+
+    Parameters:
+        previous_key: str
+            the key of the previous season's checkpoint, or initial_key() for the first season
+        season: int
+            the season
+        games: engine.GameArrays
+            the season's games
+    Returns:
+        a hex digest
+    """
+    digest = hashlib.sha256(f"{previous_key}:{season}".encode("utf-8"))
+    for array, dtype in [
+        (games.home, np.int64),
+        (games.away, np.int64),
+        (games.home_points, np.float64),
+        (games.away_points, np.float64),
+        (games.week, np.int64),
+    ]:
+        # hash fixed dtypes, so the same games give the same key wherever they were loaded from
+        digest.update(np.ascontiguousarray(array, dtype=dtype).tobytes())
+
+    return digest.hexdigest()
+
+
+def save_npz(path: Path, **arrays: np.ndarray) -> None:
+    """
+    Writes arrays to an .npz file atomically. Each writer gets its own temporary file in the same
+    directory and renames it into place, so a crash or another thread writing the same file never
+    leaves a half-written file behind
+
+    Parameters:
+        path: Path
+            the .npz file to write
+        arrays: np.ndarray
+            the arrays to store, by name
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=path.stem, suffix=".tmp.npz"
+    )
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            np.savez(tmp_file, **arrays)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def save(state: engine.RatingState, key: str) -> None:
+    """
+    Stores a checkpoint of every team's rating, wins and losses
+
+    Parameters:
+        state: engine.RatingState
+            the state at the end of a season
+        key: str
+            the checkpoint key from season_key()
+    """
+    save_npz(
+        cache.CACHE_DIR / CHECKPOINT_SUBDIR / f"{key}.npz",
+        team_ids=state.team_ids,
+        elo=state.elo,
+        wins=state.wins,
+        losses=state.losses,
+    )
+
+
+def restore(state: engine.RatingState, keys: list[str]) -> int:
+    """
+    Loads the latest available checkpoint into the state, in place
+
+    Parameters:
+        state: engine.RatingState
+            the state to restore into
+        keys: list[str]
+            the checkpoint key of every season, in order
+    Returns:
+        how many seasons the restored checkpoint covers, 0 if none was found
+    """
+    for i in range(len(keys), 0, -1):
+        path = cache.CACHE_DIR / CHECKPOINT_SUBDIR / f"{keys[i - 1]}.npz"
+        if not path.exists():
+            continue
+
+        with np.load(path) as checkpoint:
+            if not np.array_equal(checkpoint["team_ids"], state.team_ids):
+                continue
+            state.elo = checkpoint["elo"]
+            state.wins = checkpoint["wins"]
+            state.losses = checkpoint["losses"]
+
+        return i
+
+    return 0
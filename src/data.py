@@ -1,17 +1,155 @@
 import json
+import math
+import re
+from array import array
+from collections.abc import Iterator
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
 
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+import cache
+import metrics
+import store
+
 MOST_RECENT_FULL_SEASON = datetime.now().year - 1
 
-load_dotenv()
+# how many recruiting classes are averaged for a season's recruiting prior
+RECRUITING_WINDOW = 5
+
+# completed recruiting classes by year, see load_recruiting_class()
+_recruiting_classes: dict[int, DataFrame] = {}
+
+# the fields of the games endpoint load_games keeps, and their column dtypes
+# (points are float so unplayed games can be NaN)
+GAME_FIELDS = {
+    "id": np.int64,
+    "season": np.int64,
+    "week": np.int64,
+    "season_type": object,
+    "home_id": np.int64,
+    "home_team": object,
+    "home_points": np.float64,
+    "away_id": np.int64,
+    "away_team": object,
+    "away_points": np.float64,
+}
+
+# whitespace and commas between the records of a JSON array
+_JSON_SEPARATOR = re.compile(r"[\s,]*")
+
+# how many API requests prefetch() runs at once
+MAX_CONCURRENT_REQUESTS = 8
+
+
+def build_session() -> requests.Session:
+    """
+    Builds a requests Session with a connection pool big enough for prefetch() and retries with
+    exponential backoff on rate limiting and server errors
+    Returns:
+        the Session
+    """
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    adapter = HTTPAdapter(
+        pool_connections=MAX_CONCURRENT_REQUESTS,
+        pool_maxsize=MAX_CONCURRENT_REQUESTS,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.headers["authorization"] = f"Bearer {os.getenv('API_KEY')}"
+    return session
+
+
+# one pooled session shared by every API call, built by get_session() on the first API call
+_session: requests.Session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Gets the shared session, loading the API key from the env file the first time. Deferring this
+    keeps importing data.py cheap when every response is already cached
+    Returns:
+        the Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            load_dotenv()
+            _session = build_session()
+    return _session
+
+
+def fetch_cfb_api(endpoint: str, params: dict[str, str]) -> str:
+    """
+    Gets the raw JSON text of a CollegeFootballData API response, from the local cache if possible
+    (see cache.py), otherwise from the API through the shared session
+    Params:
+        endpoint: str
+            the API endpoint
+        params: dict[str, str]
+            a dictionary of request parameters
+    Returns:
+        the raw JSON text of the response
+    """
+    payload = cache.get(endpoint, params)
+
+    if payload is None:
+        with metrics.span("api_request"):
+            res = get_session().get(
+                url="https://api.collegefootballdata.com/" + endpoint,
+                params=params,
+            )
+        # never cache an error response
+        res.raise_for_status()
+        payload = res.text
+        cache.put(endpoint, params, payload)
+
+        metrics.incr("api_calls")
+        metrics.incr("api_bytes", len(res.content))
+
+    return payload
+
+
+@metrics.timed("prefetch")
+def prefetch(
+    requests_list: list[tuple[str, dict[str, str]]],
+    max_workers: int = MAX_CONCURRENT_REQUESTS,
+) -> None:
+    """
+    Fetches many API responses concurrently so the loaders below find them in the cache.
+    Total latency is bounded by the slowest request rather than the sum of all of them
+    Params:
+        requests_list: list[tuple[str, dict[str, str]]]
+            the (endpoint, params) pairs to fetch
+        max_workers: int = MAX_CONCURRENT_REQUESTS
+            the maximum number of requests in flight at once
+    """
+    # drop duplicate requests and anything the local store already holds
+    requests_list = list(
+        {
+            cache.make_key(*req): req for req in requests_list if not store.covers(*req)
+        }.values()
+    )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # list() so that any request error is raised here
+        list(executor.map(lambda req: fetch_cfb_api(*req), requests_list))
 
 
 def request_cfb_api(
@@ -34,13 +172,108 @@ def request_cfb_api(
     Returns:
         Pandas DataFrame with requested data in tabular form
     """
-    api_token = {"authorization": f"Bearer {os.getenv('API_KEY')}"}
-    res = requests.get(
-        url="https://api.collegefootballdata.com/" + endpoint,
-        headers=api_token,
-        params=params,
+    payload = fetch_cfb_api(endpoint, params)
+
+    with metrics.span("json_normalize"):
+        return pd.json_normalize(
+            json.loads(payload), record_path=record_path, meta=meta
+        )
+
+
+def iter_json_records(payload: str) -> Iterator[dict]:
+    """
+    Decodes the records of a JSON array one at a time, so only one record is ever held as Python
+    objects instead of the whole response
+    Params:
+        payload: str
+            the raw JSON text of an array of records
+    Returns:
+        an iterator of the decoded records
+    """
+    decoder = json.JSONDecoder()
+    pos = _JSON_SEPARATOR.match(payload, payload.index("[") + 1).end()
+
+    while payload[pos] != "]":
+        record, pos = decoder.raw_decode(payload, pos)
+        yield record
+        pos = _JSON_SEPARATOR.match(payload, pos).end()
+
+
+def project_json(payload: str, fields: dict[str, type]) -> DataFrame:
+    """
+    Reads only the declared fields of a JSON array of records straight into typed columns,
+    skipping every other key and the intermediate frame json_normalize would build
+    Params:
+        payload: str
+            the raw JSON text of an array of records
+        fields: dict[str, type]
+            the column dtype of every field to keep, nested fields as dotted paths like
+            "location.venue_id". Missing values become NaN in float columns and None in object
+            columns, and records missing an integer field are skipped
+    Returns:
+        Pandas DataFrame with one column per field, in the declared order
+    """
+    paths = {name: name.split(".") for name in fields}
+    buffers = {
+        name: (array(np.dtype(dtype).char) if np.dtype(dtype).kind in "iuf" else [])
+        for name, dtype in fields.items()
+    }
+    float_fields = {
+        name for name, dtype in fields.items() if np.dtype(dtype).kind == "f"
+    }
+    int_fields = {
+        name for name, dtype in fields.items() if np.dtype(dtype).kind in "iu"
+    }
+
+    for record in iter_json_records(payload):
+        values = {}
+        for name, path in paths.items():
+            value = record
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value is None and name in float_fields:
+                value = math.nan
+            values[name] = value
+
+        # an integer column can't hold a missing value, so the record is dropped like dropna() would
+        if any(values[name] is None for name in int_fields):
+            continue
+
+        for name, value in values.items():
+            buffers[name].append(value)
+
+    return DataFrame(
+        {
+            name: (
+                np.frombuffer(buffers[name], dtype=dtype)
+                if isinstance(buffers[name], array)
+                else np.array(buffers[name], dtype=object)
+            )
+            for name, dtype in fields.items()
+        }
     )
-    return pd.json_normalize(res.json(), record_path=record_path, meta=meta)
+
+
+def request_cfb_columns(
+    endpoint: str, params: dict[str, str], fields: dict[str, type]
+) -> DataFrame:
+    """
+    Calls the CollegeFootballData API and projects the declared fields of the JSON results into a
+    Pandas DataFrame, see project_json()
+    Params:
+        endpoint: str
+            the API endpoint
+        params: dict[str, str]
+            a dictionary of request parameters
+        fields: dict[str, type]
+            the column dtype of every field to keep
+    Returns:
+        Pandas DataFrame with one column per field
+    """
+    payload = fetch_cfb_api(endpoint, params)
+
+    with metrics.span("json_project"):
+        return project_json(payload, fields)
 
 
 def add_fcs_schools(df: DataFrame) -> DataFrame:
@@ -85,20 +318,40 @@ def team_df_setup(df: DataFrame) -> DataFrame:
     return df
 
 
-def load_teams(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
+def fetch_teams(season: int) -> DataFrame:
     """
-    Calls the CollegeFootballData API and gets team data in a Pandas DataFrame
+    Calls the CollegeFootballData API and gets the FBS teams of a season
     Params:
-        season: int = MOST_RECENT_FULL_SEASON
+        season: int
             The season to request data from
     Returns:
-        Pandas DataFrame with the requested season's team data
+        Pandas DataFrame with the id, school and conference of every team
     """
     # API call
     teams_df = request_cfb_api("teams/fbs", {"year": season})
 
     # drop unnecessary columns
-    teams_df = teams_df[["id", "school", "conference"]]
+    return teams_df[["id", "school", "conference"]]
+
+
+@metrics.timed("load_teams")
+def load_teams(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
+    """
+    Gets team data in a Pandas DataFrame, from the local store if the season has been ingested,
+    otherwise from the CollegeFootballData API
+    Params:
+        season: int = MOST_RECENT_FULL_SEASON
+            The season to request data from
+    Returns:
+        Pandas DataFrame with the requested season's team data
+    """
+    if store.has_table(season, "teams"):
+        # the table is tiny, so plain object columns are simpler to work with here
+        teams_df = store.read_table(season, "teams").astype(
+            {"id": np.int64, "school": object, "conference": object}
+        )
+    else:
+        teams_df = fetch_teams(season)
 
     # do some preprocessing
     teams_df = team_df_setup(teams_df)
@@ -120,27 +373,53 @@ def load_teams(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
     return teams_df
 
 
-def load_rankings(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
+def fetch_rankings(season: int) -> DataFrame:
     """
-    Calls the CollegeFootballData API and gets ranking data in a Pandas DataFrame
+    Calls the CollegeFootballData API and gets the final AP Top 25 of a season
     Params:
-        season: int = MOST_RECENT_FULL_SEASON
+        season: int
             The season to request data from
     Returns:
-        Pandas DataFrame with the requested season's ranking data
+        Pandas DataFrame with the rank and school of every ranked team
     """
     # API call
     return_df = request_cfb_api(
         "rankings", {"year": season, "seasonType": "postseason"}
     )
 
+    # until the bowls are played there's no postseason poll, so nobody is ranked yet
+    if "polls" not in return_df:
+        return pd.DataFrame(columns=["rank", "school"])
+
     # sort to only AP Top 25 teams
-    rankings_df = pd.DataFrame(
-        [x[0]["ranks"] for x in return_df["polls"] if x[0]["poll"] == "AP Top 25"][0]
-    )
+    ap_polls = [
+        x[0]["ranks"] for x in return_df["polls"] if x[0]["poll"] == "AP Top 25"
+    ]
+    if not ap_polls:
+        return pd.DataFrame(columns=["rank", "school"])
+    rankings_df = pd.DataFrame(ap_polls[0])
 
     # drop unnecessary columns
-    rankings_df = rankings_df[["rank", "school"]]
+    return rankings_df[["rank", "school"]]
+
+
+@metrics.timed("load_rankings")
+def load_rankings(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
+    """
+    Gets ranking data in a Pandas DataFrame, from the local store if the season has been ingested,
+    otherwise from the CollegeFootballData API
+    Params:
+        season: int = MOST_RECENT_FULL_SEASON
+            The season to request data from
+    Returns:
+        Pandas DataFrame with the requested season's ranking data
+    """
+    if store.has_table(season, "rankings"):
+        rankings_df = store.read_table(season, "rankings").astype(
+            {"rank": np.int64, "school": object}
+        )
+    else:
+        rankings_df = fetch_rankings(season)
 
     # rename columns
     rankings_df.columns = ["AP Ranking", "School"]
@@ -148,38 +427,28 @@ def load_rankings(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
     return rankings_df
 
 
-def load_games(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
+def fetch_games(season: int) -> DataFrame:
     """
-    Calls the CollegeFootballData API and gets game data in a Pandas DataFrame
+    Calls the CollegeFootballData API and gets every game of a season, played or not
     Params:
-        season: int = MOST_RECENT_FULL_SEASON
+        season: int
             The season to request data from
     Returns:
-        Pandas DataFrame with the requested season's game data
+        Pandas DataFrame with the season's games, unplayed games have NaN points
     """
     # init empty df
     games_df = pd.DataFrame()
 
     # loop over regular and postseason
     for seasonType in ["regular", "postseason"]:
-        # API call
-        df = request_cfb_api("games", {"year": season, "seasonType": seasonType})
-
-        # drop unnecessary columns
-        df = df[
-            [
-                "id",
-                "season",
-                "week",
-                "season_type",
-                "home_id",
-                "home_team",
-                "home_points",
-                "away_id",
-                "away_team",
-                "away_points",
-            ]
-        ]
+        # API call, keeping only the needed fields
+        df = request_cfb_columns(
+            "games", {"year": season, "seasonType": seasonType}, GAME_FIELDS
+        )
+
+        # no postseason games have been scheduled yet
+        if df.empty:
+            continue
 
         # if the game is a postseason game, make it the last week
         if seasonType == "postseason":
@@ -187,44 +456,142 @@ def load_games(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
         # join this to the main games_df
         games_df = pd.concat([games_df, df], axis=0)
 
-    games_df = games_df.dropna()
-
     return games_df
 
 
-def load_recruiting(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
+@metrics.timed("load_games")
+def load_games(
+    season: int = MOST_RECENT_FULL_SEASON, include_unplayed: bool = False
+) -> DataFrame:
     """
-    Calls the CollegeFootballData API and gets recruiting data in a Pandas DataFrame
+    Gets game data in a Pandas DataFrame, from the local store if the season has been ingested
+    (see store.py), otherwise from the CollegeFootballData API
     Params:
         season: int = MOST_RECENT_FULL_SEASON
             The season to request data from
+        include_unplayed: bool = False
+            Also return scheduled games that haven't been played yet, with NaN points
     Returns:
-        Pandas DataFrame with the requested season's recruiting data
+        Pandas DataFrame with the requested season's game data
     """
-    # init empty df
-    recruit_df = pd.DataFrame()
+    if store.has_table(season, "games"):
+        # memory-mapped, with -1 points for games that weren't played
+        games_df = store.read_table(season, "games")
+        played = (games_df["home_points"] >= 0) & (games_df["away_points"] >= 0)
+
+        if include_unplayed:
+            return games_df.assign(
+                home_points=games_df["home_points"].where(played).astype(float),
+                away_points=games_df["away_points"].where(played).astype(float),
+            )
+        # a completed season usually has every game played, so no copy is needed
+        return games_df if played.all() else games_df[played]
+
+    games_df = fetch_games(season)
+
+    if include_unplayed:
+        games_df = games_df.dropna(
+            subset=[c for c in games_df.columns if not c.endswith("_points")]
+        )
+    else:
+        games_df = games_df.dropna()
 
-    # loop over the last 5 seasons, getting recruiting data and appending it to the df
-    for season in range(int(season) - 4, int(season) + 1):
-        # API call
-        df = request_cfb_api("recruiting/teams", {"year": season})
-        # join to main df
-        recruit_df = pd.concat([recruit_df, df])
+    return games_df
 
-    # drop unnecessary columns
-    recruit_df = recruit_df.drop(
+
+def fetch_recruiting_class(season: int) -> DataFrame:
+    """
+    Calls the CollegeFootballData API and gets the recruiting class points of a single year
+    Params:
+        season: int
+            The recruiting class year
+    Returns:
+        Pandas DataFrame with the team and points of every recruiting class
+    """
+    # API call, keeping only the needed fields
+    df = request_cfb_columns(
+        "recruiting/teams", {"year": season}, {"team": object, "points": object}
+    )
+
+    # convert points column to numeric
+    df["points"] = pd.to_numeric(df["points"])
+
+    return df
+
+
+def load_recruiting_class(season: int) -> DataFrame:
+    """
+    Gets the recruiting class points of a single year, from the local store if the year has been
+    ingested, otherwise from the CollegeFootballData API. Completed years are only loaded once
+    Params:
+        season: int
+            The recruiting class year
+    Returns:
+        Pandas DataFrame with the team and points of every recruiting class
+    """
+    if season in _recruiting_classes:
+        return _recruiting_classes[season]
+
+    if store.has_table(season, "recruiting"):
+        df = store.read_table(season, "recruiting").astype({"team": object})
+    else:
+        df = fetch_recruiting_class(season)
+
+    # classes still being signed can change, so only completed years are kept
+    if cache.is_completed_season(season):
+        _recruiting_classes[season] = df
+
+    return df
+
+
+@metrics.timed("load_recruiting_index")
+def load_recruiting_index(
+    first_season: int, last_season: int, window: int = RECRUITING_WINDOW
+) -> pd.Series:
+    """
+    Averages every team's recruiting points over the trailing window of years for a range of
+    seasons at once. Each yearly class is loaded once, however many windows it is part of
+    Params:
+        first_season: int
+            The first season to average for
+        last_season: int
+            The last season to average for
+        window: int = RECRUITING_WINDOW
+            How many recruiting classes, up to and including the season's, make up its average
+    Returns:
+        Pandas Series of average points indexed by (team, season), sorted so every lookup is
+        a binary search
+    """
+    classes = pd.concat(
         [
-            "year",
-            "rank",
+            load_recruiting_class(year).assign(year=year)
+            for year in range(int(first_season) - window + 1, int(last_season) + 1)
         ],
-        axis=1,
-        errors="ignore",
+        ignore_index=True,
     )
 
-    # convert points column to numeric
-    recruit_df["points"] = pd.to_numeric(recruit_df["points"])
+    # each class counts towards the average of its own season and the next window - 1 seasons
+    classes = classes.loc[classes.index.repeat(window)]
+    classes["season"] = classes["year"].to_numpy() + np.tile(
+        np.arange(window), len(classes) // window
+    )
+    classes = classes[classes["season"].between(int(first_season), int(last_season))]
+
+    # the same groupby mean as averaging a single season's classes, so the values are identical
+    return classes.groupby(["team", "season"])["points"].mean().sort_index()
 
-    # average recruiting score over the previous 5 seasons
-    recruit_df = recruit_df.groupby(["team"]).mean()
 
-    return recruit_df
+@metrics.timed("load_recruiting")
+def load_recruiting(season: int = MOST_RECENT_FULL_SEASON) -> DataFrame:
+    """
+    Gets recruiting data in a Pandas DataFrame, from the local store for every ingested year,
+    otherwise from the CollegeFootballData API
+    Params:
+        season: int = MOST_RECENT_FULL_SEASON
+            The season to request data from
+    Returns:
+        Pandas DataFrame with every team's recruiting points averaged over the previous 5 seasons
+    """
+    recruit_index = load_recruiting_index(season, season)
+
+    return recruit_index.xs(int(season), level="season").to_frame()
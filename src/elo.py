@@ -1,14 +1,47 @@
+import hashlib
 import math
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
 from pandas import DataFrame, Series
 
+import checkpoints
 import data
-
-
+import engine
+import history
+import metrics
+
+# the rating systems offered for a single season in the app's sidebar
+# (the cumulative system is get_elo_rankings(season="all") with none of these options)
+VARIANTS = {
+    "reg": {"conference": False, "recruiting": False, "margin_of_victory": False},
+    "mov": {"conference": False, "recruiting": False, "margin_of_victory": True},
+    "recruit": {"conference": False, "recruiting": True, "margin_of_victory": False},
+    "conf": {"conference": True, "recruiting": False, "margin_of_victory": False},
+}
+
+
+# the starting elo of every team in a conference, when weighting by conference
+CONFERENCE_ELO = {
+    "ACC": 1510,
+    "American Athletic": 1475,
+    "Big 10": 1540,
+    "Big 12": 1535,
+    "Conference USA": 1460,
+    "FBS Independents": 1500,
+    "Mid American": 1450,
+    "Mountain West": 1460,
+    "Pac 12": 1510,
+    "SEC": 1550,
+    "Sun Belt": 1480,
+}
+
+
+@metrics.timed("set_fcs")
 def set_fcs(teams: DataFrame, games: DataFrame) -> DataFrame:
     """
-    Replace all FCS opponents with a placeholder value in the teams df
+    Replace all FCS opponents in the games df with the FCS placeholder
 
     Parameters:
         teams: DataFrame
@@ -16,17 +49,39 @@ def set_fcs(teams: DataFrame, games: DataFrame) -> DataFrame:
         games: DataFrame
             a df of all games
     Returns:
-        the teams df updated so all FCS opponents are replaced by the FCS placeholder
+        a copy of the games df with every opponent not in the teams df replaced by the FCS placeholder
     """
-    for g_index, game in games.iterrows():
-        if game.home_id not in teams.index:
-            games.loc[games["id"] == game.id, "home_id"] = 9999
-            games.loc[games["id"] == game.id, "home_team"] = "FCS"
-        if game.away_id not in teams.index:
-            games.loc[games["id"] == game.id, "away_id"] = 9999
-            games.loc[games["id"] == game.id, "away_team"] = "FCS"
+    games = games.copy()
 
-    return teams
+    home_fcs = ~games["home_id"].isin(teams.index)
+    away_fcs = ~games["away_id"].isin(teams.index)
+
+    games.loc[home_fcs, "home_id"] = 9999
+    games.loc[home_fcs, "home_team"] = "FCS"
+    games.loc[away_fcs, "away_id"] = 9999
+    games.loc[away_fcs, "away_team"] = "FCS"
+
+    # report how many games of each season were remapped
+    if metrics.ENABLED:
+        for season, count in count_fcs_games(games).items():
+            metrics.incr("fcs_games_remapped", int(count), {"season": str(season)})
+
+    return games
+
+
+def count_fcs_games(games: DataFrame) -> Series:
+    """
+    Count the games against the FCS placeholder in each season
+
+    Parameters:
+        games: DataFrame
+            a df of games that has already been through set_fcs
+    Returns:
+        a Series indexed by season with the number of games involving an FCS opponent
+    """
+    fcs = (games["home_id"] == 9999) | (games["away_id"] == 9999)
+
+    return fcs.groupby(games["season"]).sum()
 
 
 def process_week_games(
@@ -142,61 +197,71 @@ def update_elo(
     return teams
 
 
-def weight_by_conference(teams_df: DataFrame) -> DataFrame:
+def weight_by_conference(
+    teams_df: DataFrame, conference_elo: dict[str, float] | Series = None
+) -> DataFrame:
     """
     Weights the DataFrame elo by conference ranks
 
     Parameters:
         teams_df: DataFrame
             The DataFrame to weight
+        conference_elo: dict[str, float] | Series = None
+            The starting elo of each conference's teams, defaults to CONFERENCE_ELO. Teams in a
+            conference that isn't listed keep their elo
 
     Returns:
         The weighted DataFrame
     """
+    if conference_elo is None:
+        conference_elo = CONFERENCE_ELO
+
     df = teams_df.copy()
 
-    df.loc[df["Conference"] == "ACC", "Elo"] = 1510
-    df.loc[df["Conference"] == "American Athletic", "Elo"] = 1475
-    df.loc[df["Conference"] == "Big 10", "Elo"] = 1540
-    df.loc[df["Conference"] == "Big 12", "Elo"] = 1535
-    df.loc[df["Conference"] == "Conference USA", "Elo"] = 1460
-    df.loc[df["Conference"] == "FBS Independents", "Elo"] = 1500
-    df.loc[df["Conference"] == "Mid American", "Elo"] = 1450
-    df.loc[df["Conference"] == "Mountain West", "Elo"] = 1460
-    df.loc[df["Conference"] == "Pac 12", "Elo"] = 1510
-    df.loc[df["Conference"] == "SEC", "Elo"] = 1550
-    df.loc[df["Conference"] == "Sun Belt", "Elo"] = 1480
+    df["Elo"] = (
+        df["Conference"].map(conference_elo).fillna(df["Elo"]).astype(df["Elo"].dtype)
+    )
 
     return df
 
 
-def weight_by_recruiting(teams_df: DataFrame) -> DataFrame:
+def weight_by_recruiting(
+    teams_df: DataFrame,
+    season: int = data.MOST_RECENT_FULL_SEASON,
+    recruit_index: Series = None,
+) -> DataFrame:
     """
     Weights the DataFrame elo by recruiting ranks
 
     Parameters:
         teams_df: DataFrame
             The DataFrame to weight
+        season: int = data.MOST_RECENT_FULL_SEASON
+            The season being ranked, its recruiting class and the 4 before it are averaged
+        recruit_index: Series = None
+            The result of data.load_recruiting_index for a range of seasons including this one,
+            so that ranking many seasons loads and averages the recruiting classes only once
 
     Returns:
         The weighted DataFrame
     """
     df = teams_df.copy()
 
-    recruit_df = data.load_recruiting()
+    if recruit_index is None:
+        recruit_index = data.load_recruiting_index(season, season)
+    recruit_points = recruit_index.xs(int(season), level="season")
 
     # get average recruit points
-    avg_recruit = recruit_df["points"].mean()
-
-    for idx, team in recruit_df.iterrows():
-        recruit_score = team["points"]
-        diff = recruit_score - avg_recruit
+    avg_recruit = recruit_points.mean()
 
-        df.loc[df["School"] == team.name, "Elo"] = diff / 2 + 1500
+    # teams without recruiting data keep their elo
+    diff = df["School"].map(recruit_points) - avg_recruit
+    df["Elo"] = (diff / 2 + 1500).fillna(df["Elo"])
 
     return df
 
 
+@metrics.timed("build_teams_df")
 def build_teams_df(season: str, conference: bool, recruiting: bool) -> DataFrame:
     """
     Build a DataFrame of all teams
@@ -214,14 +279,43 @@ def build_teams_df(season: str, conference: bool, recruiting: bool) -> DataFrame
     """
     if season == "all":
         teams_df = data.load_teams()
+        season = data.MOST_RECENT_FULL_SEASON
     else:
         teams_df = data.load_teams(season)
 
+    return weight_teams_df(teams_df, conference, recruiting, int(season))
+
+
+def weight_teams_df(
+    teams_df: DataFrame,
+    conference: bool,
+    recruiting: bool,
+    season: int = data.MOST_RECENT_FULL_SEASON,
+    recruit_index: Series = None,
+) -> DataFrame:
+    """
+    Sets starting elo of a DataFrame of all teams
+
+    Parameters:
+        teams_df: DataFrame
+            The DataFrame of all teams
+        conference: bool
+            Optionally weight elo by conference strength
+        recruiting: bool
+            Optionally weight elo by recruiting strength
+        season: int = data.MOST_RECENT_FULL_SEASON
+            The season being ranked, which picks the recruiting classes
+        recruit_index: Series = None
+            Precomputed recruiting averages, see weight_by_recruiting
+
+    Returns:
+        The weighted DataFrame
+    """
     if conference:
         teams_df = weight_by_conference(teams_df)
 
     if recruiting:
-        teams_df = weight_by_recruiting(teams_df)
+        teams_df = weight_by_recruiting(teams_df, season, recruit_index)
 
     return teams_df
 
@@ -244,11 +338,171 @@ def build_season_list(season: str) -> list[int]:
     return season_list
 
 
+def plan_requests(season: str, recruiting: bool) -> list[tuple[str, dict[str, str]]]:
+    """
+    Lists every API request a get_elo_rankings call will make, so they can be prefetched
+
+    Parameters:
+        season: str
+            The season to get rankings for
+        recruiting: bool
+            Whether elo is weighted by recruiting strength
+
+    Returns:
+        A list of (endpoint, params) pairs
+    """
+    teams_season = data.MOST_RECENT_FULL_SEASON if season == "all" else season
+
+    requests_list = [
+        ("teams/fbs", {"year": teams_season}),
+        ("rankings", {"year": teams_season, "seasonType": "postseason"}),
+    ]
+
+    for games_season in build_season_list(season):
+        for season_type in ["regular", "postseason"]:
+            requests_list.append(
+                ("games", {"year": games_season, "seasonType": season_type})
+            )
+
+    if recruiting:
+        for recruiting_season in range(
+            int(teams_season) - data.RECRUITING_WINDOW + 1, int(teams_season) + 1
+        ):
+            requests_list.append(("recruiting/teams", {"year": recruiting_season}))
+
+    return requests_list
+
+
+def checkpoint_keys(
+    state: engine.RatingState,
+    season_list: list[int],
+    season_games: list[engine.GameArrays],
+    margin_of_victory: bool,
+) -> list[str]:
+    """
+    Builds the checkpoint key of every season of a replay, see checkpoints.py
+
+    Parameters:
+        state: engine.RatingState
+            the state before any games are processed
+        season_list: list[int]
+            the seasons, in order
+        season_games: list[engine.GameArrays]
+            the encoded games of each season
+        margin_of_victory: bool
+            whether elo is weighted by margin of victory
+
+    Returns:
+        One key per season, each covering the configuration and all games up to that season
+    """
+    keys = []
+    key = checkpoints.initial_key(state, margin_of_victory)
+    for season, games in zip(season_list, season_games):
+        key = checkpoints.season_key(key, season, games)
+        keys.append(key)
+    return keys
+
+
+def rankings_fingerprints(
+    season: str = "all", variants: list[dict[str, bool]] = None
+) -> list[str]:
+    """
+    Fingerprints everything get_elo_rankings would compute each variant's ranking table from,
+    without replaying any games. The games are loaded once for all variants. A fingerprint changes
+    whenever the teams, priors, games or Elo constants change
+
+    Parameters:
+        season: str = "all"
+            The season to get rankings for
+        variants: list[dict[str, bool]] = None
+            The rating systems, each a dict of get_elo_rankings' conference, recruiting and
+            margin_of_victory options. Defaults to VARIANTS
+
+    Returns:
+        One hex digest per variant
+    """
+    if variants is None:
+        variants = list(VARIANTS.values())
+
+    data.prefetch(
+        plan_requests(season, any(v.get("recruiting", False) for v in variants))
+    )
+
+    variant_dfs = [
+        build_teams_df(season, v.get("conference", False), v.get("recruiting", False))
+        for v in variants
+    ]
+    season_list = build_season_list(season)
+
+    # the priors don't change which teams there are, so every variant shares the encoded games
+    state = engine.init_state(variant_dfs[0])
+    season_games = [
+        engine.encode_games(
+            state, set_fcs(variant_dfs[0], data.load_games(season=season))
+        )
+        for season in season_list
+    ]
+
+    fingerprints = []
+    for v, teams_df in zip(variants, variant_dfs):
+        keys = checkpoint_keys(
+            engine.init_state(teams_df),
+            season_list,
+            season_games,
+            v.get("margin_of_victory", False),
+        )
+
+        # the key covers the ratings, the teams' names, conferences and AP rankings are in the
+        # table too
+        digest = hashlib.sha256(keys[-1].encode())
+        digest.update(pd.util.hash_pandas_object(teams_df).to_numpy().tobytes())
+        fingerprints.append(digest.hexdigest())
+
+    return fingerprints
+
+
+def rankings_fingerprint(
+    season: str = "all",
+    conference: bool = False,
+    recruiting: bool = False,
+    margin_of_victory: bool = False,
+) -> str:
+    """
+    Fingerprints everything get_elo_rankings would compute a ranking table from, see
+    rankings_fingerprints
+
+    Parameters:
+        season: str = "all"
+            The season to get rankings for
+        conference: bool = False
+            Optionally weight elo by conference
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+
+    Returns:
+        A hex digest
+    """
+    return rankings_fingerprints(
+        season,
+        [
+            {
+                "conference": conference,
+                "recruiting": recruiting,
+                "margin_of_victory": margin_of_victory,
+            }
+        ],
+    )[0]
+
+
+@metrics.timed("get_elo_rankings")
 def get_elo_rankings(
     season: str = "all",
     conference: bool = False,
     recruiting: bool = False,
     margin_of_victory: bool = False,
+    record_history: bool = False,
 ) -> DataFrame:
     """
     Ranks all college football teams by their elo rating
@@ -262,39 +516,149 @@ def get_elo_rankings(
             Optionally weight elo by recruiting rank
         margin_of_victory: bool = False
             Optionally weight elo by margin of victory
+        record_history: bool = False
+            Optionally store every team's rating after every week, see history.py
 
     Returns:
         A dataframe containing all teams as ranked by elo
 
     """
+    # fetch everything up front, concurrently
+    data.prefetch(plan_requests(season, recruiting))
+
     teams_df = build_teams_df(season, conference, recruiting)
     season_list = build_season_list(season)
+    history_key = history.history_key(season, conference, recruiting, margin_of_victory)
+
+    # keep ratings in dense arrays for the whole replay
+    state = engine.init_state(teams_df)
+
+    season_games = [
+        engine.encode_games(state, set_fcs(teams_df, data.load_games(season=season)))
+        for season in season_list
+    ]
+
+    # every season-end checkpoint is keyed by the configuration and all games up to that season
+    keys = checkpoint_keys(state, season_list, season_games, margin_of_victory)
+
+    # when recording, seasons without a stored history have to be replayed even if checkpointed
+    if record_history:
+        # a history replayed from other games, e.g. before a score correction, is stale
+        recorded = [
+            history.is_recorded(history_key, s, key)
+            for s, key in zip(season_list, keys)
+        ]
+        keys_to_restore = keys[: recorded.index(False) if False in recorded else None]
+    else:
+        keys_to_restore = keys
 
-    elo_col = teams_df["Elo"].copy()
-
-    for season in season_list:
-        games_df = data.load_games(season=season)
-        elo_rankings_df = set_fcs(teams_df, games_df)
+    # resume from the latest valid checkpoint and only replay the seasons after it
+    with metrics.span("checkpoint_restore"):
+        start = checkpoints.restore(state, keys_to_restore)
+    metrics.incr("seasons_restored", start)
 
+    for season, games, key in zip(
+        season_list[start:], season_games[start:], keys[start:]
+    ):
         # reset wins/losses
-        elo_rankings_df["Wins"] = 0
-        elo_rankings_df["Losses"] = 0
-
-        weeks = games_df.week.unique()
-
-        for i in weeks:
-            elo_rankings_df = process_week_games(
-                elo_rankings_df, games_df[games_df.week == i], margin_of_victory
-            )
+        engine.reset_record(state)
+
+        with metrics.span("week_loop"):
+            if record_history:
+                season_history = history.replay_recorded(
+                    state, games, margin_of_victory, teams_df["School"].to_numpy()
+                )
+                history.save(season_history, history_key, season, key)
+            else:
+                for week_games in engine.iter_weeks(games):
+                    engine.replay_week(state, week_games, margin_of_victory)
+        metrics.incr("games_processed", len(games.home))
 
         # revert elo towards the mean
         # this is so past results aren't weighted as heavily as results from the current season
         # it also simulates player turnover, coach turnover, etc. between seasons
-        elo_rankings_df["Elo"] = elo_rankings_df["Elo"].apply(
-            revert_to_mean, args=(elo_rankings_df["Elo"].mean(),)
+        with metrics.span("revert_to_mean"):
+            engine.revert_state_to_mean(state)
+
+        with metrics.span("checkpoint_save"):
+            checkpoints.save(state, key)
+
+    return engine.state_to_df(state, teams_df)
+
+
+@metrics.timed("get_elo_rankings_variants")
+def get_elo_rankings_variants(
+    season: str = "all", variants: list[dict[str, bool]] = None
+) -> list[DataFrame]:
+    """
+    Ranks all college football teams under several rating systems at once. The games are loaded
+    and walked once, with a (variants x teams) elo matrix updated by every week's batch
+
+    Parameters:
+        season: str = "all"
+            The season to get rankings for
+        variants: list[dict[str, bool]] = None
+            The rating systems, each a dict of get_elo_rankings' conference, recruiting and
+            margin_of_victory options. Defaults to VARIANTS
+
+    Returns:
+        A list with one dataframe per variant, each the same as get_elo_rankings would return
+
+    """
+    if variants is None:
+        variants = list(VARIANTS.values())
+
+    data.prefetch(
+        plan_requests(season, any(v.get("recruiting", False) for v in variants))
+    )
+
+    if season == "all":
+        teams_df = data.load_teams()
+        prior_season = data.MOST_RECENT_FULL_SEASON
+    else:
+        teams_df = data.load_teams(season)
+        prior_season = int(season)
+
+    variant_dfs = [
+        weight_teams_df(
+            teams_df,
+            v.get("conference", False),
+            v.get("recruiting", False),
+            prior_season,
         )
+        for v in variants
+    ]
+    margin_of_victory = np.array(
+        [[v.get("margin_of_victory", False)] for v in variants]
+    )
 
-    return elo_rankings_df
+    # one row of elo per variant, wins and losses don't depend on the variant
+    state = engine.init_state(teams_df)
+    state.elo = np.vstack([df["Elo"].to_numpy(dtype=np.float64) for df in variant_dfs])
+
+    for season in build_season_list(season):
+        games_df = set_fcs(teams_df, data.load_games(season=season))
+        games = engine.encode_games(state, games_df)
+
+        # reset wins/losses
+        engine.reset_record(state)
+
+        with metrics.span("week_loop"):
+            for week_games in engine.iter_weeks(games):
+                engine.replay_week(state, week_games, margin_of_victory)
+        metrics.incr("games_processed", len(games.home))
+
+        # revert elo towards the mean
+        with metrics.span("revert_to_mean"):
+            engine.revert_state_to_mean(state)
+
+    return [
+        engine.state_to_df(
+            engine.RatingState(state.team_ids, variant_elo, state.wins, state.losses),
+            variant_df,
+        )
+        for variant_elo, variant_df in zip(state.elo, variant_dfs)
+    ]
 
 
 def revert_to_mean(x: int, mean: float) -> float:
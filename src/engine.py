@@ -0,0 +1,448 @@
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# the K factor used by elo.update_elo
+K = 50
+
+# the constants of the margin-of-victory multiplier used by elo.update_elo:
+# ln(margin_of_victory + 1) * MOV_SCALE / (winner_elo_diff * MOV_SLOPE + MOV_SCALE)
+MOV_SCALE = 2.2
+MOV_SLOPE = 0.001
+
+# how far towards the mean ratings revert between seasons, as in elo.revert_to_mean
+REVERSION = 0.7
+
+
+@dataclass
+class RatingState:
+    """
+    The rating state of every team during a replay, stored in dense NumPy arrays
+
+    Attributes:
+        team_ids: np.ndarray
+            the team IDs, in the same order as the teams DataFrame index
+        elo: np.ndarray
+            each team's current Elo
+        wins: np.ndarray
+            each team's win count for the current season
+        losses: np.ndarray
+            each team's loss count for the current season
+    """
+
+    team_ids: np.ndarray
+    elo: np.ndarray
+    wins: np.ndarray
+    losses: np.ndarray
+
+
+@dataclass
+class GameArrays:
+    """
+    A season of games encoded against a RatingState's team index
+
+    Attributes:
+        home: np.ndarray
+            the dense index of each game's home team
+        away: np.ndarray
+            the dense index of each game's away team
+        home_points: np.ndarray
+            the home team's score
+        away_points: np.ndarray
+            the away team's score
+        week: np.ndarray
+            the week each game was played in
+    """
+
+    home: np.ndarray
+    away: np.ndarray
+    home_points: np.ndarray
+    away_points: np.ndarray
+    week: np.ndarray
+
+
+@dataclass
+class WeekSnapshots:
+    """
+    The rating state before the first week of a season and after every week replayed since
+
+    Attributes:
+        weeks: np.ndarray
+            the season's weeks, in the order iter_weeks replays them
+        elo: list[np.ndarray]
+            each team's Elo before the first week, then after each replayed week
+        wins: list[np.ndarray]
+            each team's wins at the same points
+        losses: list[np.ndarray]
+            each team's losses at the same points
+    """
+
+    weeks: np.ndarray
+    elo: list[np.ndarray]
+    wins: list[np.ndarray]
+    losses: list[np.ndarray]
+
+
+def init_state(teams: DataFrame) -> RatingState:
+    """
+    Build a RatingState from a teams DataFrame
+
+    Parameters:
+        teams: DataFrame
+            a df of all teams, indexed by team ID, with Elo, Wins and Losses columns
+    Returns:
+        a RatingState holding a copy of the teams' Elo, wins and losses
+    """
+    return RatingState(
+        team_ids=teams.index.to_numpy(),
+        elo=teams["Elo"].to_numpy(dtype=np.float64, copy=True),
+        wins=teams["Wins"].to_numpy(dtype=np.int64, copy=True),
+        losses=teams["Losses"].to_numpy(dtype=np.int64, copy=True),
+    )
+
+
+def encode_games(state: RatingState, games: DataFrame) -> GameArrays:
+    """
+    Map a games DataFrame onto the dense team index of a RatingState
+
+    Parameters:
+        state: RatingState
+            the state whose team index to use
+        games: DataFrame
+            a df of games, with FCS opponents already replaced by the FCS placeholder
+    Returns:
+        the games as GameArrays, in their original order
+    """
+    team_index = pd.Index(state.team_ids)
+    home = team_index.get_indexer(games["home_id"])
+    away = team_index.get_indexer(games["away_id"])
+
+    if (home < 0).any() or (away < 0).any():
+        raise Exception("every game must be between teams in the teams df")
+
+    return GameArrays(
+        home=home,
+        away=away,
+        home_points=games["home_points"].to_numpy(dtype=np.float64),
+        away_points=games["away_points"].to_numpy(dtype=np.float64),
+        # the store keeps weeks as int16 and the API as int64, they must hash the same
+        week=games["week"].to_numpy(dtype=np.int64),
+    )
+
+
+def iter_weeks(games: GameArrays) -> Iterator[GameArrays]:
+    """
+    Split a season of games into weeks, in the order each week first appears
+
+    Parameters:
+        games: GameArrays
+            the season's games
+    Returns:
+        an iterator of GameArrays, one per week, keeping the original game order within each week
+    """
+    codes, weeks = pd.factorize(games.week)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(weeks) + 1))
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield take_games(games, order[start:end])
+
+
+def take_games(games: GameArrays, idx: np.ndarray) -> GameArrays:
+    """
+    Select a subset of games
+
+    Parameters:
+        games: GameArrays
+            the games to select from
+        idx: np.ndarray
+            the positions (or boolean mask) of the games to keep
+    Returns:
+        the selected games as GameArrays
+    """
+    return GameArrays(
+        home=games.home[idx],
+        away=games.away[idx],
+        home_points=games.home_points[idx],
+        away_points=games.away_points[idx],
+        week=games.week[idx],
+    )
+
+
+def conflict_free_levels(games: GameArrays) -> np.ndarray:
+    """
+    Assign each game to a batch in which no team plays more than once.
+    Each team's games stay in their original order across batches, so processing the batches one after
+    another gives the same ratings as processing the games one at a time
+
+    Parameters:
+        games: GameArrays
+            the games to split, usually a single week
+    Returns:
+        the batch of every game, batches are processed in increasing order
+    """
+    teams = np.concatenate([games.home, games.away])
+
+    # the usual case: nobody plays twice this week
+    if len(np.unique(teams)) == len(teams):
+        return np.zeros(len(games.home), dtype=np.int64)
+
+    # each game goes one level after the latest earlier game involving either of its teams
+    last_level = {}
+    levels = np.empty(len(games.home), dtype=np.int64)
+    for i, (home, away) in enumerate(zip(games.home.tolist(), games.away.tolist())):
+        level = max(last_level.get(home, -1), last_level.get(away, -1)) + 1
+        last_level[home] = last_level[away] = levels[i] = level
+
+    return levels
+
+
+def conflict_free_batches(games: GameArrays) -> Iterator[GameArrays]:
+    """
+    Split games into batches in which no team plays more than once, see conflict_free_levels
+
+    Parameters:
+        games: GameArrays
+            the games to split, usually a single week
+    Returns:
+        an iterator of GameArrays with no team appearing twice in any one of them
+    """
+    levels = conflict_free_levels(games)
+
+    # the usual case: nobody plays twice this week
+    if not levels.any():
+        yield games
+        return
+
+    for level in range(levels.max() + 1):
+        yield take_games(games, np.flatnonzero(levels == level))
+
+
+def update_batch(
+    state: RatingState,
+    games: GameArrays,
+    margin_of_victory: bool | np.ndarray = False,
+    k: float | np.ndarray = K,
+    mov_scale: float | np.ndarray = MOV_SCALE,
+    mov_slope: float | np.ndarray = MOV_SLOPE,
+) -> np.ndarray:
+    """
+    Process a batch of games in which no team plays more than once, updating the state in place.
+    Vectorized version of elo.update_elo: gathers both teams' Elo, computes every game's expected scores
+    and margin-of-victory multiplier at once and scatters the rounded new ratings back.
+
+    state.elo may be 1-D (teams) or 2-D (variants x teams), in which case margin_of_victory, k, mov_scale
+    and mov_slope may be arrays of shape (variants, 1) to give every variant its own settings
+
+    Parameters:
+        state: RatingState
+            the state to update
+        games: GameArrays
+            the games to process, no team may appear twice
+        margin_of_victory: bool | np.ndarray = False
+            optionally weight elo by margin of victory
+        k: float | np.ndarray = K
+            the K factor
+        mov_scale: float | np.ndarray = MOV_SCALE
+            the scale constant of the margin-of-victory multiplier
+        mov_slope: float | np.ndarray = MOV_SLOPE
+            how much the margin-of-victory multiplier shrinks per point of the winner's elo advantage
+    Returns:
+        the pre-game expected score of the home team in every game
+    """
+    elo = state.elo
+    home = games.home
+    away = games.away
+
+    home_elo = elo[..., home]
+    away_elo = elo[..., away]
+
+    home_won = games.home_points > games.away_points
+    outcome_h = home_won.astype(np.float64)
+    outcome_a = 1 - outcome_h
+    winner_elo_diff = np.where(home_won, home_elo - away_elo, away_elo - home_elo)
+
+    expected_h = 1 / (1 + (10 ** ((away_elo - home_elo) / 400)))
+    expected_a = 1 / (1 + (10 ** ((home_elo - away_elo) / 400)))
+
+    # ties count as away wins, so the winner's margin is never negative
+    mov = np.where(margin_of_victory, np.abs(games.home_points - games.away_points), 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mov_multiplier = np.where(
+            mov > 0,
+            np.log(mov + 1) * (mov_scale / (winner_elo_diff * mov_slope + mov_scale)),
+            1.0,
+        )
+
+    # np.rint rounds half to even, like round()
+    elo[..., home] = np.rint(home_elo + (k * mov_multiplier * (outcome_h - expected_h)))
+    elo[..., away] = np.rint(away_elo + (k * mov_multiplier * (outcome_a - expected_a)))
+
+    state.wins[home[home_won]] += 1
+    state.losses[away[home_won]] += 1
+    state.losses[home[~home_won]] += 1
+    state.wins[away[~home_won]] += 1
+
+    return expected_h
+
+
+def replay_week(
+    state: RatingState,
+    week_games: GameArrays,
+    margin_of_victory: bool | np.ndarray = False,
+    k: float | np.ndarray = K,
+    mov_scale: float | np.ndarray = MOV_SCALE,
+    mov_slope: float | np.ndarray = MOV_SLOPE,
+    on_batch: Callable[[GameArrays, np.ndarray], None] = None,
+) -> RatingState:
+    """
+    Process a week of games with the batched kernel, updating the state in place.
+    Gives the same ratings as processing the games one at a time with elo.update_elo
+
+    Parameters:
+        state: RatingState
+            the state to update
+        week_games: GameArrays
+            the week's games
+        margin_of_victory: bool | np.ndarray = False
+            optionally weight elo by margin of victory
+        k: float | np.ndarray = K
+            the K factor
+        mov_scale: float | np.ndarray = MOV_SCALE
+            the scale constant of the margin-of-victory multiplier
+        mov_slope: float | np.ndarray = MOV_SLOPE
+            how much the margin-of-victory multiplier shrinks per point of the winner's elo advantage
+        on_batch: Callable[[GameArrays, np.ndarray], None] = None
+            optionally called after each batch with the batch and its pre-game home expected scores
+    Returns:
+        the updated state
+    """
+    for batch in conflict_free_batches(week_games):
+        expected_h = update_batch(
+            state, batch, margin_of_victory, k, mov_scale, mov_slope
+        )
+        if on_batch is not None:
+            on_batch(batch, expected_h)
+
+    return state
+
+
+def replay_snapshots(
+    state: RatingState,
+    games: GameArrays,
+    margin_of_victory: bool = False,
+    snapshots: WeekSnapshots = None,
+    start: int = None,
+) -> WeekSnapshots:
+    """
+    Process a season week by week, keeping a copy of the state after every week so the season
+    can later be resumed from any week without replaying the ones before it
+
+    Parameters:
+        state: RatingState
+            the state to update in place, before the first week unless snapshots are given
+        games: GameArrays
+            the season's games
+        margin_of_victory: bool = False
+            optionally weight elo by margin of victory
+        snapshots: WeekSnapshots = None
+            earlier snapshots of the same season, to resume from instead of starting over
+        start: int = None
+            how many weeks of the snapshots to keep, all of them by default. The state is restored
+            to the snapshot after that many weeks and the weeks after it are replayed
+    Returns:
+        the snapshots, extended to every week of the games
+    """
+    weeks = pd.unique(games.week)
+
+    if snapshots is None:
+        snapshots = WeekSnapshots(
+            weeks, [state.elo.copy()], [state.wins.copy()], [state.losses.copy()]
+        )
+    else:
+        if start is None:
+            start = len(snapshots.elo) - 1
+        snapshots = WeekSnapshots(
+            weeks,
+            snapshots.elo[: start + 1],
+            snapshots.wins[: start + 1],
+            snapshots.losses[: start + 1],
+        )
+        state.elo = snapshots.elo[-1].copy()
+        state.wins = snapshots.wins[-1].copy()
+        state.losses = snapshots.losses[-1].copy()
+
+    done = len(snapshots.elo) - 1
+    for i, week_games in enumerate(iter_weeks(games)):
+        if i < done:
+            continue
+        replay_week(state, week_games, margin_of_victory)
+        snapshots.elo.append(state.elo.copy())
+        snapshots.wins.append(state.wins.copy())
+        snapshots.losses.append(state.losses.copy())
+
+    return snapshots
+
+
+def revert_state_to_mean(
+    state: RatingState, factor: float | np.ndarray = REVERSION
+) -> RatingState:
+    """
+    Revert every team's Elo part of the way towards the mean, in place.
+    Array version of elo.revert_to_mean
+
+    Parameters:
+        state: RatingState
+            the state to update
+        factor: float | np.ndarray = REVERSION
+            how far to move towards the mean, from 0 (not at all) to 1 (all the way)
+    Returns:
+        the updated state
+    """
+    elo = state.elo
+    mean = elo.mean(axis=-1, keepdims=True) if elo.ndim > 1 else elo.mean()
+    state.elo = np.where(
+        elo > mean, elo - (factor * (elo - mean)), elo + (factor * (mean - elo))
+    )
+
+    return state
+
+
+def reset_record(state: RatingState) -> RatingState:
+    """
+    Reset every team's wins and losses to 0, in place
+
+    Parameters:
+        state: RatingState
+            the state to update
+    Returns:
+        the updated state
+    """
+    state.wins[:] = 0
+    state.losses[:] = 0
+
+    return state
+
+
+def state_to_df(state: RatingState, teams: DataFrame) -> DataFrame:
+    """
+    Write a RatingState back onto a copy of the teams DataFrame it was built from
+
+    Parameters:
+        state: RatingState
+            the state to write
+        teams: DataFrame
+            the teams df the state was built from
+    Returns:
+        a copy of the teams df with Wins, Losses and Elo taken from the state
+    """
+    df = teams.copy()
+
+    df["Wins"] = state.wins
+    df["Losses"] = state.losses
+    df["Elo"] = state.elo
+
+    return df
@@ -0,0 +1,288 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import cache
+import engine
+
+# weekly rating histories are stored in this subdirectory of the cache directory
+HISTORY_SUBDIR = "history"
+
+
+@dataclass
+class SeasonHistory:
+    """
+    Every team's rating and record after every week of a season
+
+    Attributes:
+        team_ids: np.ndarray
+            the team IDs, one per column
+        schools: np.ndarray
+            the school names, one per column
+        weeks: np.ndarray
+            the weeks, one per row
+        elo: np.ndarray
+            (weeks x teams) Elo after each week, float32
+        wins: np.ndarray
+            (weeks x teams) wins after each week, int16
+        losses: np.ndarray
+            (weeks x teams) losses after each week, int16
+    """
+
+    team_ids: np.ndarray
+    schools: np.ndarray
+    weeks: np.ndarray
+    elo: np.ndarray
+    wins: np.ndarray
+    losses: np.ndarray
+
+    def __post_init__(self):
+        self.team_index = pd.Index(self.team_ids)
+        self.week_index = pd.Index(self.weeks)
+
+
+def history_key(
+    season: str, conference: bool, recruiting: bool, margin_of_victory: bool
+) -> str:
+    """
+    Names the history of one get_elo_rankings configuration
+
+    Parameters:
+        season: str
+            the season argument of get_elo_rankings, "all" for the cumulative rankings
+        conference: bool
+            whether elo is weighted by conference
+        recruiting: bool
+            whether elo is weighted by recruiting
+        margin_of_victory: bool
+            whether elo is weighted by margin of victory
+
+    Returns:
+        the name, e.g. "season-mov" or "cumulative-reg"
+    """
+    mode = "cumulative" if season == "all" else "season"
+    flags = [
+        name
+        for name, enabled in [
+            ("conf", conference),
+            ("recruit", recruiting),
+            ("mov", margin_of_victory),
+        ]
+        if enabled
+    ]
+    return f"{mode}-{'-'.join(flags) or 'reg'}"
+
+
+def replay_recorded(
+    state: engine.RatingState,
+    games: engine.GameArrays,
+    margin_of_victory: bool,
+    schools: np.ndarray,
+) -> SeasonHistory:
+    """
+    Replays a season week by week like get_elo_rankings, recording the state after every week
+
+    Parameters:
+        state: engine.RatingState
+            the state to update in place
+        games: engine.GameArrays
+            the season's games
+        margin_of_victory: bool
+            optionally weight elo by margin of victory
+        schools: np.ndarray
+            the school names, in the state's team order
+
+    Returns:
+        the season's history
+    """
+    weeks, elo, wins, losses = [], [], [], []
+
+    for week_games in engine.iter_weeks(games):
+        engine.replay_week(state, week_games, margin_of_victory)
+        weeks.append(week_games.week[0])
+        elo.append(state.elo.astype(np.float32))
+        wins.append(state.wins.astype(np.int16))
+        losses.append(state.losses.astype(np.int16))
+
+    num_teams = len(state.team_ids)
+    return SeasonHistory(
+        team_ids=state.team_ids,
+        schools=np.asarray(schools, dtype=str),
+        weeks=np.array(weeks, dtype=np.int16),
+        elo=np.array(elo, dtype=np.float32).reshape(-1, num_teams),
+        wins=np.array(wins, dtype=np.int16).reshape(-1, num_teams),
+        losses=np.array(losses, dtype=np.int16).reshape(-1, num_teams),
+    )
+
+
+def save(
+    season_history: SeasonHistory, key: str, season: int, checkpoint_key: str
+) -> None:
+    """
+    Stores a season's history as plain .npy files, so it can be memory-mapped later
+
+    Parameters:
+        season_history: SeasonHistory
+            the history to store
+        key: str
+            the configuration name from history_key
+        season: int
+            the season
+        checkpoint_key: str
+            the season's checkpoint key, which identifies the games the history was replayed from
+    """
+    season_dir = cache.CACHE_DIR / HISTORY_SUBDIR / key / str(season)
+    season_dir.mkdir(parents=True, exist_ok=True)
+
+    for name in ["team_ids", "schools", "weeks", "elo", "wins", "losses"]:
+        np.save(season_dir / f"{name}.npy", getattr(season_history, name))
+
+    # written last, so a history is only ever matched once all of it is on disk
+    (season_dir / "checkpoint_key.txt").write_text(checkpoint_key)
+
+
+def is_recorded(key: str, season: int, checkpoint_key: str = None) -> bool:
+    """
+    Checks whether a season's history has been stored
+
+    Parameters:
+        key: str
+            the configuration name from history_key
+        season: int
+            the season
+        checkpoint_key: str = None
+            only count a history replayed from the same games, see elo.checkpoint_keys
+
+    Returns:
+        True if load() will find it
+    """
+    path = cache.CACHE_DIR / HISTORY_SUBDIR / key / str(season) / "checkpoint_key.txt"
+    if not path.exists():
+        return False
+    return checkpoint_key is None or path.read_text() == checkpoint_key
+
+
+def load(key: str, season: int) -> SeasonHistory:
+    """
+    Memory-maps a stored season history, only the rows and columns that are queried get read
+
+    Parameters:
+        key: str
+            the configuration name from history_key
+        season: int
+            the season
+
+    Returns:
+        the season's history
+    """
+    season_dir = cache.CACHE_DIR / HISTORY_SUBDIR / key / str(season)
+    if not is_recorded(key, season):
+        raise FileNotFoundError(f"no rating history recorded for {key} {season}")
+
+    return SeasonHistory(
+        **{
+            name: np.load(season_dir / f"{name}.npy", mmap_mode="r")
+            for name in ["team_ids", "schools", "weeks", "elo", "wins", "losses"]
+        }
+    )
+
+
+def trajectory(season_history: SeasonHistory, team_id: int) -> DataFrame:
+    """
+    One team's rating and record after every week
+
+    Parameters:
+        season_history: SeasonHistory
+            the season's history
+        team_id: int
+            the team's ID
+
+    Returns:
+        a DataFrame indexed by week with Elo, Wins and Losses columns
+    """
+    team = season_history.team_index.get_loc(team_id)
+
+    return DataFrame(
+        {
+            "Elo": season_history.elo[:, team],
+            "Wins": season_history.wins[:, team],
+            "Losses": season_history.losses[:, team],
+        },
+        index=pd.Index(season_history.weeks, name="Week"),
+    )
+
+
+def snapshot(season_history: SeasonHistory, week: int) -> DataFrame:
+    """
+    Every team's rating and record after one week
+
+    Parameters:
+        season_history: SeasonHistory
+            the season's history
+        week: int
+            the week
+
+    Returns:
+        a DataFrame indexed by team ID with School, Wins, Losses and Elo columns
+    """
+    row = season_history.week_index.get_loc(week)
+
+    return DataFrame(
+        {
+            "School": season_history.schools,
+            "Wins": season_history.wins[row],
+            "Losses": season_history.losses[row],
+            "Elo": season_history.elo[row],
+        },
+        index=pd.Index(season_history.team_ids, name="ID"),
+    )
+
+
+def top_n(season_history: SeasonHistory, week: int, n: int = 25) -> DataFrame:
+    """
+    The highest rated teams after one week
+
+    Parameters:
+        season_history: SeasonHistory
+            the season's history
+        week: int
+            the week
+        n: int = 25
+            how many teams to return
+
+    Returns:
+        the top n rows of snapshot(), best first
+    """
+    row = season_history.week_index.get_loc(week)
+    elo = np.asarray(season_history.elo[row])
+
+    n = min(n, len(elo))
+    top = np.argpartition(-elo, n - 1)[:n]
+    top = top[np.argsort(-elo[top], kind="stable")]
+
+    return snapshot(season_history, week).iloc[top]
+
+
+def elo_at(season_history: SeasonHistory, team_id: int, week: int) -> float:
+    """
+    One team's rating after one week
+
+    Parameters:
+        season_history: SeasonHistory
+            the season's history
+        team_id: int
+            the team's ID
+        week: int
+            the week
+
+    Returns:
+        the team's Elo
+    """
+    return float(
+        season_history.elo[
+            season_history.week_index.get_loc(week),
+            season_history.team_index.get_loc(team_id),
+        ]
+    )
@@ -0,0 +1,309 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import cache
+import checkpoints
+import data
+import elo
+import engine
+import history
+
+# in-season watermarks are stored in this subdirectory of the cache directory
+LIVE_SUBDIR = "live"
+
+
+def watermark_path(key: str, season: int) -> Path:
+    """
+    Gets the file a season's watermark is stored in
+
+    Parameters:
+        key: str
+            the configuration name from history.history_key
+        season: int
+            the season
+
+    Returns:
+        the path of the .npz file
+    """
+    return cache.CACHE_DIR / LIVE_SUBDIR / f"{key}-{season}.npz"
+
+
+def load_watermark(key: str, season: int) -> dict[str, np.ndarray] | None:
+    """
+    Loads what has been processed of a season so far
+
+    Parameters:
+        key: str
+            the configuration name from history.history_key
+        season: int
+            the season
+
+    Returns:
+        the team IDs, the processed weeks in order, the rating state before the first week and
+        after every processed week ((weeks + 1) x teams elo, wins and losses) and the processed
+        games, or None if nothing has been processed yet
+    """
+    path = watermark_path(key, season)
+    if not path.exists():
+        return None
+
+    with np.load(path) as watermark:
+        return dict(watermark)
+
+
+def save_watermark(key: str, season: int, **arrays: np.ndarray) -> None:
+    """
+    Stores what has been processed of a season so far
+
+    Parameters:
+        key: str
+            the configuration name from history.history_key
+        season: int
+            the season
+        arrays: np.ndarray
+            the arrays described in load_watermark
+    """
+    checkpoints.save_npz(watermark_path(key, season), **arrays)
+
+
+def game_records(game_ids: np.ndarray, games: engine.GameArrays) -> np.ndarray:
+    """
+    Packs everything about a season's games that affects the ratings into one array, so processed
+    and current games can be compared week by week
+
+    Parameters:
+        game_ids: np.ndarray
+            each game's ID
+        games: engine.GameArrays
+            the encoded games
+
+    Returns:
+        a (games x 6) array of ID, week, home, away, home points and away points
+    """
+    return np.column_stack(
+        [
+            game_ids,
+            games.week,
+            games.home,
+            games.away,
+            games.home_points,
+            games.away_points,
+        ]
+    ).astype(np.float64)
+
+
+def first_changed_week(
+    watermark: dict[str, np.ndarray], records: np.ndarray, weeks: np.ndarray
+) -> int:
+    """
+    Finds the first processed week whose games are no longer the same, because of a late score
+    correction, a game reported late or a game that was removed
+
+    Parameters:
+        watermark: dict[str, np.ndarray]
+            the result of load_watermark
+        records: np.ndarray
+            the current games, from game_records
+        weeks: np.ndarray
+            the current weeks in the order they are replayed
+
+    Returns:
+        how many processed weeks are still valid, the replay resumes after them
+    """
+    processed = watermark["records"]
+
+    for i, week in enumerate(watermark["weeks"]):
+        if i >= len(weeks) or weeks[i] != week:
+            return i
+        if not np.array_equal(
+            processed[processed[:, 1] == week], records[records[:, 1] == week]
+        ):
+            return i
+
+    return len(watermark["weeks"])
+
+
+def update_state(
+    season: int,
+    conference: bool = False,
+    recruiting: bool = False,
+    margin_of_victory: bool = False,
+    refresh: bool = True,
+) -> tuple[DataFrame, engine.RatingState, dict[str, int]]:
+    """
+    Brings a season's ratings up to date by replaying only the weeks that are new or changed since
+    the last update. If a processed week's games changed, ratings roll back to the state before that
+    week and everything after it is replayed
+
+    Parameters:
+        season: int
+            the season in progress
+        conference: bool = False
+            Optionally weight elo by conference
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+        refresh: bool = True
+            Fetch the season's games again instead of serving them from the response cache
+
+    Returns:
+        the teams, the state after the latest week (before any season-end mean reversion), and how
+        many weeks were kept and replayed and how many games were replayed
+    """
+    key = history.history_key(str(season), conference, recruiting, margin_of_victory)
+
+    # offline, the cached responses are all there is
+    if refresh and not cache.OFFLINE:
+        for season_type in ["regular", "postseason"]:
+            cache.invalidate("games", {"year": season, "seasonType": season_type})
+
+    teams_df = elo.build_teams_df(str(season), conference, recruiting)
+    state = engine.init_state(teams_df)
+
+    games_df = elo.set_fcs(teams_df, data.load_games(season=season))
+    games = engine.encode_games(state, games_df)
+    records = game_records(games_df["id"].to_numpy(), games)
+    weeks = pd.unique(games.week)
+
+    watermark = load_watermark(key, season)
+    kept = 0
+    if (
+        watermark is not None
+        and np.array_equal(watermark["team_ids"], state.team_ids)
+        and np.array_equal(watermark["elo"][0], state.elo)
+    ):
+        kept = first_changed_week(watermark, records, weeks)
+
+    # resume after the last valid week, or start over from the priors
+    snapshots = None
+    if kept:
+        snapshots = engine.WeekSnapshots(
+            watermark["weeks"],
+            list(watermark["elo"]),
+            list(watermark["wins"]),
+            list(watermark["losses"]),
+        )
+    snapshots = engine.replay_snapshots(
+        state, games, margin_of_victory, snapshots, start=kept
+    )
+    replayed = int(np.isin(games.week, weeks[kept:]).sum())
+
+    save_watermark(
+        key,
+        season,
+        team_ids=state.team_ids,
+        weeks=snapshots.weeks,
+        elo=np.array(snapshots.elo),
+        wins=np.array(snapshots.wins),
+        losses=np.array(snapshots.losses),
+        records=records,
+    )
+
+    return (
+        teams_df,
+        state,
+        {
+            "weeks_kept": kept,
+            "weeks_replayed": len(weeks) - kept,
+            "games_replayed": replayed,
+        },
+    )
+
+
+def update(
+    season: int,
+    conference: bool = False,
+    recruiting: bool = False,
+    margin_of_victory: bool = False,
+    refresh: bool = True,
+) -> tuple[DataFrame, dict[str, int]]:
+    """
+    Brings a season's rankings up to date, see update_state. The result is the same as
+    elo.get_elo_rankings
+
+    Parameters:
+        season: int
+            the season in progress
+        conference: bool = False
+            Optionally weight elo by conference
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+        refresh: bool = True
+            Fetch the season's games again instead of serving them from the response cache
+
+    Returns:
+        the rankings, and how many weeks were kept and replayed and how many games were replayed
+    """
+    teams_df, state, summary = update_state(
+        season, conference, recruiting, margin_of_victory, refresh
+    )
+
+    # the stored states are from before the season-end mean reversion get_elo_rankings applies
+    engine.revert_state_to_mean(state)
+
+    return engine.state_to_df(state, teams_df), summary
+
+
+def current_ratings(
+    season: int,
+    conference: bool = False,
+    recruiting: bool = False,
+    margin_of_victory: bool = False,
+    refresh: bool = False,
+) -> DataFrame:
+    """
+    Gets every team's rating after the latest week of a season. Unlike elo.get_elo_rankings these
+    aren't pulled towards the mean for the next season, so they are the ratings the season's games
+    are actually played with, e.g. for win probabilities
+
+    Parameters:
+        season: int
+            the season
+        conference: bool = False
+            Optionally weight elo by conference
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+        refresh: bool = False
+            Fetch the season's games again instead of serving them from the response cache
+
+    Returns:
+        a dataframe of all teams like elo.get_elo_rankings returns
+    """
+    teams_df, state, _ = update_state(
+        season, conference, recruiting, margin_of_victory, refresh
+    )
+    return engine.state_to_df(state, teams_df)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Update an in-progress season's rankings with the games played since the last update"
+    )
+    parser.add_argument("--season", type=int, default=data.MOST_RECENT_FULL_SEASON + 1)
+    parser.add_argument("--variant", choices=list(elo.VARIANTS), default="reg")
+    args = parser.parse_args()
+
+    rankings_df, summary = update(args.season, **elo.VARIANTS[args.variant])
+
+    print(
+        f"kept {summary['weeks_kept']} weeks, replayed {summary['weeks_replayed']} weeks"
+        f" ({summary['games_replayed']} games)"
+    )
+    print(
+        rankings_df.sort_values(by=["Elo"], ascending=False)
+        .head(25)[["School", "Wins", "Losses", "Elo"]]
+        .to_string()
+    )
+
+
+if __name__ == "__main__":
+    main()
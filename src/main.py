@@ -2,7 +2,8 @@ from datetime import datetime
 
 import streamlit as st
 
-import elo
+import metrics
+import warmup
 
 
 def get_ranking(df):
@@ -74,8 +75,87 @@ def get_last_ten_years_as_str() -> list[str]:
     return [str(x) for x in range(datetime.now().year - 10, datetime.now().year)]
 
 
+def draw_warmup():
+    seasons = get_last_ten_years_as_str()
+    warmup.start(seasons)
+
+    labels = {
+        "reg": "Elo",
+        "cum": "Cumulative",
+        "mov": "Margin of Victory",
+        "recruit": "Recruiting",
+        "conf": "Conferences",
+    }
+    warm = st.sidebar.expander("Ready to view")
+    for page, season in warmup.plan_views(seasons):
+        if warmup.is_warm(page, season):
+            warm.caption(f"{labels[page]} {'' if season == 'all' else season}")
+    if warmup.is_running():
+        warm.caption("Still crunching the rest...")
+
+
+def draw_debug():
+    debug = st.expander("Debug")
+    debug.text(metrics.summary())
+    debug.code(metrics.to_prometheus(), language="text")
+    if debug.button("Reset timings"):
+        metrics.reset()
+
+
+def draw_matchups():
+    import elo
+    import matchup
+    import memo
+
+    st.subheader("Matchups")
+
+    labels = {
+        "Elo": "reg",
+        "Margin of Victory": "mov",
+        "Recruiting": "recruit",
+        "Conferences": "conf",
+    }
+    season = st.selectbox("Season", get_last_ten_years_as_str())
+    system = st.selectbox("Rating system", list(labels))
+    home_field = st.slider("Home-field advantage (Elo points)", 0, 100, 0)
+
+    with st.spinner("Crunching some numbers..."):
+        # the ratings the games were played with, not the ones pulled towards the mean
+        matchups = matchup.get_matchups(
+            memo.get_current_ratings(season, **elo.VARIANTS[labels[system]]),
+            home_field=home_field,
+        )
+
+    # best-rated teams first
+    order = matchup.top_n(matchups, len(matchups.team_ids))
+    schools = dict(zip(matchups.schools[order], matchups.team_ids[order]))
+
+    team = st.selectbox("Team", list(schools))
+    opponent = st.selectbox("Opponent", list(schools), index=1)
+    venue = st.radio("Where", ["neutral", "home", "away"], horizontal=True)
+    st.metric(
+        f"{team} beats {opponent}",
+        f"{matchup.matchup(matchups, schools[team], schools[opponent], venue):.1%}",
+    )
+
+    st.write("Chance of beating every other top 25 team on a neutral field")
+    beat_df = matchup.beat_top_n(matchups).head(25)
+    beat_df["Beat Top 25"] = beat_df["Beat Top 25"].map("{:.2e}".format)
+    st.table(beat_df.reset_index(drop=True))
+
+    size = st.radio("Playoff", [4, 12], horizontal=True)
+    seeds = matchups.team_ids[matchup.top_n(matchups, size)]
+    st.table(matchup.bracket(matchups, list(seeds)))
+
+
 def draw_page():
-    if "sb_page" in st.session_state:
+    if st.session_state.get("sb_page") == "matchup":
+        draw_matchups()
+
+    elif "sb_page" in st.session_state:
+        # the rating engine is only imported once a page needs it, so the intro renders right away
+        import memo
+
         match st.session_state["sb_page"]:
             case "reg":
                 subheader = "Regular Elo Ratings"
@@ -165,7 +245,7 @@ def draw_page():
             with st.spinner("Crunching some numbers..."):
                 st.table(
                     get_ranking(
-                        elo.get_elo_rankings(
+                        memo.get_rankings(
                             season=season,
                             margin_of_victory=margin_of_victory,
                             recruiting=recruiting,
@@ -176,13 +256,16 @@ def draw_page():
         else:
             st.text(f"Seasons {datetime.now().year - 10}-{datetime.now().year - 1}")
             with st.spinner("Crunching some numbers..."):
-                st.table(get_ranking(elo.get_elo_rankings(season="all")))
+                st.table(get_ranking(memo.get_rankings(season="all")))
 
         expander = st.expander("Methodology")
         expander.write(methodology_string)
         expander.write("")
         expander.write(data_from_string)
 
+        if metrics.ENABLED:
+            draw_debug()
+
     else:
         draw_intro()
 
@@ -200,6 +283,11 @@ def main():
     mov = st.sidebar.button("Margin of Victory")
     recruit = st.sidebar.button("Recruiting")
     conf = st.sidebar.button("Conferences")
+    matchups = st.sidebar.button("Matchups")
+
+    # precompute the likeliest views in the background
+    if warmup.ENABLED:
+        draw_warmup()
 
     # update state to represent selected sidebar tab
     if reg:
@@ -212,6 +300,8 @@ def main():
         st.session_state["sb_page"] = "recruit"
     elif conf:
         st.session_state["sb_page"] = "conf"
+    elif matchups:
+        st.session_state["sb_page"] = "matchup"
 
     if "sb_page" in st.session_state:
         print(st.session_state["sb_page"])
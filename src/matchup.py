@@ -0,0 +1,321 @@
+import dataclasses
+import hashlib
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import memo
+
+# how many win-probability matrices are kept in memory at once
+MAX_ENTRIES = 16
+
+
+@dataclass
+class Matchups:
+    """
+    Every team's chance of beating every other team, from one set of ratings
+
+    Attributes:
+        team_ids: np.ndarray
+            the team IDs, in matrix order
+        schools: np.ndarray
+            the school names, in matrix order
+        elo: np.ndarray
+            the ratings the matrix was built from
+        neutral: np.ndarray
+            teams x teams, the probability the row team beats the column team on a neutral field
+        home: np.ndarray
+            teams x teams, the probability the row team beats the column team at home
+    """
+
+    team_ids: np.ndarray
+    schools: np.ndarray
+    elo: np.ndarray
+    neutral: np.ndarray
+    home: np.ndarray
+
+    @property
+    def team_index(self) -> pd.Index:
+        return pd.Index(self.team_ids)
+
+    def probabilities(self, venue: str = "neutral") -> np.ndarray:
+        """
+        Picks the matrix for where the row team plays
+
+        Parameters:
+            venue: str = "neutral"
+                "neutral", "home" or "away"
+
+        Returns:
+            teams x teams, the probability the row team beats the column team
+        """
+        match venue:
+            case "neutral":
+                return self.neutral
+            case "home":
+                return self.home
+            case "away":
+                # the row team is away exactly when the column team is at home
+                return 1 - self.home.T
+            case _:
+                raise Exception(f"unknown venue {venue}")
+
+
+# neutral-field matchups by ratings fingerprint
+_matchups = memo.BoundedCache(MAX_ENTRIES)
+
+
+def win_probability_matrix(elo: np.ndarray, home_field: float = 0.0) -> np.ndarray:
+    """
+    Evaluates the elo.update_elo expected score for every pair of teams at once
+
+    Parameters:
+        elo: np.ndarray
+            every team's rating
+        home_field: float = 0.0
+            Elo points added to the row team, as if it played at home
+
+    Returns:
+        teams x teams, the probability the row team beats the column team
+    """
+    return 1 / (
+        1 + 10 ** ((elo[np.newaxis, :] - elo[:, np.newaxis] - home_field) / 400)
+    )
+
+
+def home_matrix(neutral: np.ndarray, home_field: float) -> np.ndarray:
+    """
+    Shifts neutral-field win probabilities by a home-field advantage, without going back to the
+    ratings
+
+    Parameters:
+        neutral: np.ndarray
+            teams x teams, the probability the row team beats the column team on a neutral field
+        home_field: float
+            Elo points added to the row team
+
+    Returns:
+        teams x teams, the probability the row team beats the column team at home
+    """
+    if not home_field:
+        return neutral
+
+    # the neutral odds against the row team are 10 ** ((elo_j - elo_i) / 400)
+    odds_against = (1 - neutral) / neutral
+    return 1 / (1 + odds_against * 10 ** (-home_field / 400))
+
+
+def fingerprint(rankings_df: DataFrame) -> str:
+    """
+    Identifies a ratings snapshot, so its matrix is only built once
+
+    Parameters:
+        rankings_df: DataFrame
+            a ratings table like elo.get_elo_rankings returns
+
+    Returns:
+        a hex digest of the team IDs and ratings
+    """
+    digest = hashlib.sha256()
+    digest.update(rankings_df.index.to_numpy(dtype=np.int64).tobytes())
+    digest.update(rankings_df["Elo"].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def get_matchups(rankings_df: DataFrame, home_field: float = 0.0) -> Matchups:
+    """
+    Builds the win-probability matrices for a ratings snapshot. The neutral-field matrix is
+    memoized per snapshot in a bounded LRU cache shared across sessions, and the home-field one is
+    derived from it, so changing the home-field advantage never rebuilds it. The FCS placeholder
+    isn't a team, so it is left out
+
+    Parameters:
+        rankings_df: DataFrame
+            the ratings the games are played with, e.g. memo.get_current_ratings. The tables of
+            elo.get_elo_rankings are already pulled towards the mean for the next season
+        home_field: float = 0.0
+            the home-field advantage in Elo points. The ratings are fitted without one, so 0 keeps
+            the probabilities consistent with them
+
+    Returns:
+        the matchups
+    """
+    rankings_df = rankings_df.drop(index=9999, errors="ignore")
+    key = fingerprint(rankings_df)
+
+    matchups = _matchups.get(key)
+    if matchups is None:
+        elo = rankings_df["Elo"].to_numpy(dtype=np.float64)
+        neutral = win_probability_matrix(elo)
+        matchups = Matchups(
+            team_ids=rankings_df.index.to_numpy(),
+            schools=rankings_df["School"].to_numpy(),
+            elo=elo,
+            neutral=neutral,
+            home=neutral,
+        )
+        _matchups.put(key, matchups)
+
+    if not home_field:
+        return matchups
+    return dataclasses.replace(matchups, home=home_matrix(matchups.neutral, home_field))
+
+
+def team_positions(matchups: Matchups, team_ids: list[int]) -> np.ndarray:
+    """
+    Finds teams in the matrices
+
+    Parameters:
+        matchups: Matchups
+            the matchups
+        team_ids: list[int]
+            the team IDs
+
+    Returns:
+        each team's row in the matrices
+    """
+    positions = matchups.team_index.get_indexer(team_ids)
+    if (positions < 0).any():
+        raise Exception(f"unknown teams {np.asarray(team_ids)[positions < 0].tolist()}")
+    return positions
+
+
+def matchup(
+    matchups: Matchups, team: int, opponent: int, venue: str = "neutral"
+) -> float:
+    """
+    Looks up one team's chance of beating another
+
+    Parameters:
+        matchups: Matchups
+            the matchups
+        team: int
+            the team's ID
+        opponent: int
+            the opponent's ID
+        venue: str = "neutral"
+            where the team plays, "neutral", "home" or "away"
+
+    Returns:
+        the probability the team wins
+    """
+    i, j = team_positions(matchups, [team, opponent])
+    return float(matchups.probabilities(venue)[i, j])
+
+
+def top_n(matchups: Matchups, n: int = 25) -> np.ndarray:
+    """
+    Finds the best-rated teams
+
+    Parameters:
+        matchups: Matchups
+            the matchups
+        n: int = 25
+            how many teams
+
+    Returns:
+        the teams' rows in the matrices, best first
+    """
+    return np.argsort(-matchups.elo, kind="stable")[:n]
+
+
+def beat_top_n(matchups: Matchups, n: int = 25, venue: str = "neutral") -> DataFrame:
+    """
+    Works out every team's chance of beating each of the top n teams in turn. A top-n team only has
+    to beat the other n - 1
+
+    Parameters:
+        matchups: Matchups
+            the matchups
+        n: int = 25
+            how many of the best-rated teams to beat
+        venue: str = "neutral"
+            where every game is played from the team's side, "neutral", "home" or "away"
+
+    Returns:
+        every team's School, Elo and the probability of winning all of those games, best chance first
+    """
+    top = top_n(matchups, n)
+    against_top = matchups.probabilities(venue)[:, top].copy()
+    # nobody plays themselves
+    against_top[top, np.arange(len(top))] = 1.0
+
+    return DataFrame(
+        {
+            "School": matchups.schools,
+            "Elo": matchups.elo,
+            f"Beat Top {n}": against_top.prod(axis=1),
+        },
+        index=pd.Index(matchups.team_ids, name="ID"),
+    ).sort_values(by=[f"Beat Top {n}"], ascending=False)
+
+
+def bracket_order(size: int) -> list[int]:
+    """
+    Places seeds in a single-elimination bracket so the top seeds meet as late as possible
+
+    Parameters:
+        size: int
+            the number of slots, a power of two
+
+    Returns:
+        the 0-based seed in every slot, e.g. [0, 3, 1, 2] for 4 slots
+    """
+    order = [0]
+    while len(order) < size:
+        order = [s for seed in order for s in (seed, 2 * len(order) - 1 - seed)]
+    return order
+
+
+def bracket(matchups: Matchups, seeds: list[int]) -> DataFrame:
+    """
+    Works out every seed's chance of winning each round of a neutral-site single-elimination
+    playoff. When the field isn't a power of two the top seeds get byes
+
+    Parameters:
+        matchups: Matchups
+            the matchups
+        seeds: list[int]
+            the team IDs, best seed first
+
+    Returns:
+        one row per seed with its School, Elo and probability of winning each round
+    """
+    positions = team_positions(matchups, seeds)
+    rounds = max(int(np.ceil(np.log2(len(seeds)))), 1)
+    size = 2**rounds
+
+    # byes take the bottom seeds, they lose every game and never play each other
+    slots = np.array(bracket_order(size))
+    slot_teams = np.where(
+        slots < len(seeds), positions[np.minimum(slots, len(seeds) - 1)], -1
+    )
+    is_bye = slot_teams < 0
+    slot_probs = matchups.neutral[np.ix_(slot_teams, slot_teams)]
+    slot_probs[is_bye, :] = 0.0
+    slot_probs[:, is_bye] = 1.0
+
+    # win[i] is the probability that slot i's team has won every game so far
+    win = np.ones(size)
+    by_round = []
+    slot = np.arange(size)
+    for r in range(rounds):
+        # the possible opponents are in the other half of the slot's block of 2^(r + 1)
+        same_block = (slot[:, np.newaxis] >> (r + 1)) == (
+            slot[np.newaxis, :] >> (r + 1)
+        )
+        same_half = (slot[:, np.newaxis] >> r) == (slot[np.newaxis, :] >> r)
+        opponents = same_block & ~same_half
+        win = win * ((slot_probs * opponents) @ win)
+        by_round.append(win)
+
+    columns = [f"Win Round {r + 1}" for r in range(rounds - 1)] + ["Champion"]
+    bracket_df = DataFrame(np.column_stack(by_round), columns=columns)
+    bracket_df["Seed"] = slots + 1
+    bracket_df = bracket_df[~is_bye].set_index("Seed").sort_index()
+
+    bracket_df.insert(0, "School", matchups.schools[positions])
+    bracket_df.insert(1, "Elo", matchups.elo[positions])
+    return bracket_df
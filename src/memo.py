@@ -0,0 +1,253 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from pandas import DataFrame
+
+import cache
+import elo
+import live
+import results
+
+# how many ranking tables are kept in memory at once
+MAX_ENTRIES = 64
+
+
+class BoundedCache:
+    """
+    A thread-safe dict that forgets its least recently used entries once it holds more than
+    max_entries. A module-level instance is shared by every Streamlit session, since modules are
+    only imported once per process
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Parameters:
+            max_entries: int
+                how many entries are kept at once
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Looks up an entry, marking it as the most recently used
+
+        Parameters:
+            key: Hashable
+                the entry's key
+
+        Returns:
+            the entry, or None if it isn't cached
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Stores an entry, dropping the least recently used ones if there are too many
+
+        Parameters:
+            key: Hashable
+                the entry's key
+            value: Any
+                the entry
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def drop(self, predicate: Callable[[Hashable], bool]) -> list[Hashable]:
+        """
+        Drops every entry whose key matches
+
+        Parameters:
+            predicate: Callable[[Hashable], bool]
+                called with each key, True drops the entry
+
+        Returns:
+            the keys of the dropped entries
+        """
+        with self._lock:
+            dropped = [key for key in self._entries if predicate(key)]
+            for key in dropped:
+                del self._entries[key]
+        return dropped
+
+    def keys(self) -> list[Hashable]:
+        """
+        Lists the cached keys
+
+        Returns:
+            the keys, least recently used first
+        """
+        with self._lock:
+            return list(self._entries)
+
+
+# computed ranking tables as (computed_at, table) by (season, margin_of_victory, recruiting,
+# conference)
+_results = BoundedCache(MAX_ENTRIES)
+
+# live.current_ratings snapshots as (computed_at, table), keyed like _results
+_ratings = BoundedCache(MAX_ENTRIES)
+
+
+def is_expired(season: str, computed_at: float) -> bool:
+    """
+    Checks whether a memoized ranking table may be out of date
+
+    Parameters:
+        season: str
+            the season the table was computed for
+        computed_at: float
+            the unix time the table was computed at
+
+    Returns:
+        True if the season is still in progress and the table is older than cache.CURRENT_SEASON_TTL
+    """
+    if season == "all" or cache.is_completed_season(int(season)):
+        return False
+    return time.time() - computed_at >= cache.CURRENT_SEASON_TTL
+
+
+def get_rankings(
+    season: str,
+    margin_of_victory: bool = False,
+    recruiting: bool = False,
+    conference: bool = False,
+) -> DataFrame:
+    """
+    Returns elo.get_elo_rankings, memoized in a bounded LRU cache shared across sessions. Tables
+    missing from the memo are read from the results store (see precompute.py) before being computed
+
+    Parameters:
+        season: str
+            The season to get rankings for
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        conference: bool = False
+            Optionally weight elo by conference
+
+    Returns:
+        A copy of the ranking table, safe for the caller to modify
+    """
+    key = (season, margin_of_victory, recruiting, conference)
+
+    entry = _results.get(key)
+    if entry is not None:
+        computed_at, df = entry
+        if not is_expired(season, computed_at):
+            return df.copy()
+        _results.drop(lambda cached_key: cached_key == key)
+
+    # a table from precompute.py is a lookup instead of a fetch and replay
+    stored = results.get(season, margin_of_victory, recruiting, conference)
+    if stored is not None and not is_expired(season, stored[1]):
+        _, computed_at, df = stored
+    else:
+        computed_at = time.time()
+        df = elo.get_elo_rankings(
+            season=season,
+            margin_of_victory=margin_of_victory,
+            recruiting=recruiting,
+            conference=conference,
+        )
+
+    _results.put(key, (computed_at, df))
+
+    return df.copy()
+
+
+def get_current_ratings(
+    season: str,
+    margin_of_victory: bool = False,
+    recruiting: bool = False,
+    conference: bool = False,
+) -> DataFrame:
+    """
+    Returns live.current_ratings, memoized in a bounded LRU cache shared across sessions, so pages
+    that rerun on every widget change don't replay the season each time
+
+    Parameters:
+        season: str
+            The season to get ratings for
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        conference: bool = False
+            Optionally weight elo by conference
+
+    Returns:
+        A copy of the ratings, safe for the caller to modify
+    """
+    key = (str(season), margin_of_victory, recruiting, conference)
+
+    entry = _ratings.get(key)
+    if entry is not None:
+        computed_at, df = entry
+        if not is_expired(key[0], computed_at):
+            return df.copy()
+        _ratings.drop(lambda cached_key: cached_key == key)
+
+    computed_at = time.time()
+    df = live.current_ratings(
+        int(season),
+        conference=conference,
+        recruiting=recruiting,
+        margin_of_victory=margin_of_victory,
+    )
+    _ratings.put(key, (computed_at, df))
+
+    return df.copy()
+
+
+def invalidate(season: str = None) -> None:
+    """
+    Drops memoized ranking tables and ratings, e.g. when new in-season games arrive. The season's cached game
+    responses are dropped too, so the next request ranks the new games
+
+    Parameters:
+        season: str = None
+            only drop tables for this season (and the cumulative tables); drop everything if None
+    """
+    dropped = _results.drop(
+        lambda key: season is None or key[0] in (str(season), "all")
+    )
+    dropped += _ratings.drop(lambda key: season is None or key[0] == str(season))
+    seasons = {key[0] for key in dropped} if season is None else {str(season)}
+
+    # otherwise the next request would serve the stored table again
+    results.invalidate(season)
+
+    # the cumulative tables only cover completed seasons, whose games never change, and offline
+    # the cached responses are all there is
+    if not cache.OFFLINE:
+        for games_season in seasons - {"all"}:
+            if cache.is_completed_season(int(games_season)):
+                continue
+            for season_type in ["regular", "postseason"]:
+                cache.invalidate(
+                    "games", {"year": games_season, "seasonType": season_type}
+                )
+
+
+def cached_keys() -> list[tuple[str, bool, bool, bool]]:
+    """
+    Lists the ranking tables currently memoized
+
+    Returns:
+        the (season, margin_of_victory, recruiting, conference) keys, least recently used first
+    """
+    return _results.keys()
@@ -0,0 +1,226 @@
+import functools
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from contextlib import nullcontext
+
+# turn instrumentation on with CFB_METRICS=1, or metrics.enable()
+ENABLED = os.getenv("CFB_METRICS", "0") == "1"
+
+logger = logging.getLogger("college_football_elo.metrics")
+
+_lock = threading.Lock()
+
+# stage name -> [number of runs, total seconds, slowest run in seconds]
+_spans: dict[str, list[float]] = {}
+
+# counter name -> value
+_counters: dict[str, float] = {}
+
+# what span() returns while instrumentation is off
+_NULL_SPAN = nullcontext()
+
+
+class Span:
+    """
+    Times a block of code and records it under a stage name
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            stats = _spans.setdefault(self.name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+        return False
+
+
+def enable(enabled: bool = True) -> None:
+    """
+    Turns instrumentation on or off
+    Params:
+        enabled: bool = True
+            whether to record spans and counters
+    """
+    global ENABLED
+    ENABLED = enabled
+
+
+def span(name: str) -> Span | nullcontext:
+    """
+    Times a block of code, as in `with metrics.span("load_games"): ...`.
+    Costs a single flag check while instrumentation is off
+    Params:
+        name: str
+            the stage name
+    Returns:
+        a context manager
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorates a function so every call is recorded as a span
+    Params:
+        name: str
+            the stage name
+    Returns:
+        the decorator
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def series_name(name: str, labels: dict[str, str] = None) -> str:
+    """
+    Builds the key a counter series is stored under, in Prometheus notation
+    Params:
+        name: str
+            the counter name
+        labels: dict[str, str] = None
+            the series' labels, e.g. {"season": "2023"}
+    Returns:
+        the name, followed by the labels in braces if there are any
+    """
+    if not labels:
+        return name
+    return (
+        name
+        + "{"
+        + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+        + "}"
+    )
+
+
+def incr(name: str, value: float = 1, labels: dict[str, str] = None) -> None:
+    """
+    Adds to a counter
+    Params:
+        name: str
+            the counter name
+        value: float = 1
+            how much to add
+        labels: dict[str, str] = None
+            optionally the series of the counter to add to, e.g. {"season": "2023"}
+    """
+    if not ENABLED:
+        return
+    key = series_name(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def reset() -> None:
+    """
+    Clears every span and counter
+    """
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def snapshot() -> dict[str, dict]:
+    """
+    Copies the current spans and counters
+    Returns:
+        {"spans": {stage: {"count", "total_seconds", "max_seconds"}}, "counters": {name: value}}
+    """
+    with _lock:
+        return {
+            "spans": {
+                name: {
+                    "count": int(count),
+                    "total_seconds": total,
+                    "max_seconds": slowest,
+                }
+                for name, (count, total, slowest) in _spans.items()
+            },
+            "counters": dict(_counters),
+        }
+
+
+def summary() -> str:
+    """
+    Formats the current spans and counters as a plain text table
+    Returns:
+        the summary, one stage or counter per line, slowest stages first
+    """
+    current = snapshot()
+
+    lines = [f"{'stage':32} {'count':>6} {'total ms':>10} {'max ms':>10}"]
+    for name, stats in sorted(
+        current["spans"].items(), key=lambda item: -item[1]["total_seconds"]
+    ):
+        lines.append(
+            f"{name:32} {stats['count']:6d} {stats['total_seconds'] * 1000:10.1f}"
+            f" {stats['max_seconds'] * 1000:10.1f}"
+        )
+    for name, value in sorted(current["counters"].items()):
+        lines.append(f"{name:32} {value:>6.0f}")
+
+    return "\n".join(lines)
+
+
+def log_summary(level: int = logging.INFO) -> None:
+    """
+    Writes the summary to the metrics logger
+    Params:
+        level: int = logging.INFO
+            the log level
+    """
+    logger.log(level, "stage timings and counters:\n%s", summary())
+
+
+def to_prometheus() -> str:
+    """
+    Formats the current spans and counters in the Prometheus text exposition format
+    Returns:
+        the metrics text
+    """
+    current = snapshot()
+
+    lines = [
+        "# HELP cfb_stage_seconds Time spent in each stage.",
+        "# TYPE cfb_stage_seconds summary",
+    ]
+    for name, stats in sorted(current["spans"].items()):
+        lines.append(
+            f'cfb_stage_seconds_sum{{stage="{name}"}} {stats["total_seconds"]}'
+        )
+        lines.append(f'cfb_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+
+    # a labelled counter's series all belong to one metric family
+    families: dict[str, list[tuple[str, float]]] = {}
+    for key, value in sorted(current["counters"].items()):
+        name, _, labels = key.partition("{")
+        families.setdefault(name, []).append(("{" + labels if labels else "", value))
+
+    for name, series in families.items():
+        lines.append(f"# TYPE cfb_{name}_total counter")
+        for labels, value in series:
+            lines.append(f"cfb_{name}_total{labels} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,90 @@
+import argparse
+
+import elo
+import results
+import warmup
+
+
+def precompute(seasons: list[str], force: bool = False) -> list[tuple[str, str]]:
+    """
+    Computes every page of the app for every season into the results store, skipping tables
+    whose data fingerprint hasn't changed since they were last written. A season's pages are
+    fingerprinted and computed together, so its games are loaded and walked once
+    Params:
+        seasons: list[str]
+            the seasons offered in the app, oldest first
+        force: bool = False
+            recompute every table even if its fingerprint is unchanged
+    Returns:
+        the (page, season) views that were written
+    """
+    # group the pages by season, keeping the order warmup.plan_views puts them in
+    pages_by_season = {}
+    for page, season in warmup.plan_views(seasons):
+        pages_by_season.setdefault(season, []).append(page)
+
+    written = []
+    for season, pages in pages_by_season.items():
+        options = [warmup.PAGES[page] or {} for page in pages]
+        fingerprints = elo.rankings_fingerprints(season, options)
+
+        stale = []
+        for page, page_options, fingerprint in zip(pages, options, fingerprints):
+            if (
+                not force
+                and results.get_fingerprint(season, **page_options) == fingerprint
+            ):
+                # still current, so the app can keep serving it for an in-progress season
+                results.touch(season, **page_options)
+            else:
+                stale.append((page, page_options, fingerprint))
+
+        if not stale:
+            continue
+
+        if season == "all":
+            # the cumulative page is a single variant that resumes from season checkpoints
+            rankings_dfs = [elo.get_elo_rankings(season=season, **stale[0][1])]
+        else:
+            rankings_dfs = elo.get_elo_rankings_variants(
+                season, [page_options for _, page_options, _ in stale]
+            )
+
+        for (page, page_options, fingerprint), rankings_df in zip(stale, rankings_dfs):
+            results.put(
+                season,
+                fingerprint=fingerprint,
+                rankings_df=rankings_df,
+                **page_options,
+            )
+            written.append((page, season))
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute every ranking table the app shows into the results store"
+    )
+    parser.add_argument(
+        "--seasons", nargs="+", default=None, help="defaults to the app's seasons"
+    )
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    seasons = args.seasons
+    if seasons is None:
+        # main.py imports streamlit, so only import it when its season list is needed
+        from main import get_last_ten_years_as_str
+
+        seasons = get_last_ten_years_as_str()
+
+    written = precompute(seasons, args.force)
+
+    for page, season in written:
+        print(f"wrote {page} {season}")
+    print(f"{len(written)} tables written, the rest were up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import pickle
+import sqlite3
+import time
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from pandas import DataFrame
+
+import cache
+
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """
+    Opens the results database next to the response cache, creating it if needed, and commits and
+    closes it afterwards
+    Returns:
+        a connection to the results database
+    """
+    cache.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(cache.CACHE_DIR / "rankings.sqlite", timeout=30)
+    try:
+        with con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS rankings"
+                " (season TEXT, margin_of_victory INTEGER, recruiting INTEGER,"
+                " conference INTEGER, fingerprint TEXT NOT NULL, computed_at REAL NOT NULL,"
+                " payload BLOB NOT NULL,"
+                " PRIMARY KEY (season, margin_of_victory, recruiting, conference))"
+            )
+            yield con
+    finally:
+        con.close()
+
+
+def get(
+    season: str,
+    margin_of_victory: bool = False,
+    recruiting: bool = False,
+    conference: bool = False,
+) -> tuple[str, float, DataFrame] | None:
+    """
+    Looks up a precomputed ranking table
+    Params:
+        season: str
+            the season of the rankings
+        margin_of_victory: bool = False
+            whether elo is weighted by margin of victory
+        recruiting: bool = False
+            whether elo is weighted by recruiting rank
+        conference: bool = False
+            whether elo is weighted by conference
+    Returns:
+        the data fingerprint, the unix time the table was computed at and the table, or None if it
+        hasn't been precomputed
+    """
+    with connect() as con:
+        row = con.execute(
+            "SELECT fingerprint, computed_at, payload FROM rankings"
+            " WHERE season = ? AND margin_of_victory = ? AND recruiting = ? AND conference = ?",
+            (str(season), margin_of_victory, recruiting, conference),
+        ).fetchone()
+
+    if row is None:
+        return None
+
+    # the database is only ever written by put() on this machine, so unpickling it is safe
+    return row[0], row[1], pickle.loads(zlib.decompress(row[2]))
+
+
+def put(
+    season: str,
+    fingerprint: str,
+    rankings_df: DataFrame,
+    margin_of_victory: bool = False,
+    recruiting: bool = False,
+    conference: bool = False,
+) -> None:
+    """
+    Stores a ranking table
+    Params:
+        season: str
+            the season of the rankings
+        fingerprint: str
+            the data fingerprint from elo.rankings_fingerprint
+        rankings_df: DataFrame
+            the result of elo.get_elo_rankings
+        margin_of_victory: bool = False
+            whether elo is weighted by margin of victory
+        recruiting: bool = False
+            whether elo is weighted by recruiting rank
+        conference: bool = False
+            whether elo is weighted by conference
+    """
+    with connect() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO rankings VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(season),
+                margin_of_victory,
+                recruiting,
+                conference,
+                fingerprint,
+                time.time(),
+                zlib.compress(pickle.dumps(rankings_df, pickle.HIGHEST_PROTOCOL)),
+            ),
+        )
+
+
+def get_fingerprint(
+    season: str,
+    margin_of_victory: bool = False,
+    recruiting: bool = False,
+    conference: bool = False,
+) -> str | None:
+    """
+    Looks up the data fingerprint of a precomputed ranking table without loading the table
+    Params:
+        season: str
+            the season of the rankings
+        margin_of_victory: bool = False
+            whether elo is weighted by margin of victory
+        recruiting: bool = False
+            whether elo is weighted by recruiting rank
+        conference: bool = False
+            whether elo is weighted by conference
+    Returns:
+        the fingerprint, or None if the table hasn't been precomputed
+    """
+    with connect() as con:
+        row = con.execute(
+            "SELECT fingerprint FROM rankings"
+            " WHERE season = ? AND margin_of_victory = ? AND recruiting = ? AND conference = ?",
+            (str(season), margin_of_victory, recruiting, conference),
+        ).fetchone()
+
+    return None if row is None else row[0]
+
+
+def touch(
+    season: str,
+    margin_of_victory: bool = False,
+    recruiting: bool = False,
+    conference: bool = False,
+) -> None:
+    """
+    Marks a precomputed ranking table as current, when its fingerprint shows nothing has changed
+    Params:
+        season: str
+            the season of the rankings
+        margin_of_victory: bool = False
+            whether elo is weighted by margin of victory
+        recruiting: bool = False
+            whether elo is weighted by recruiting rank
+        conference: bool = False
+            whether elo is weighted by conference
+    """
+    with connect() as con:
+        con.execute(
+            "UPDATE rankings SET computed_at = ?"
+            " WHERE season = ? AND margin_of_victory = ? AND recruiting = ? AND conference = ?",
+            (time.time(), str(season), margin_of_victory, recruiting, conference),
+        )
+
+
+def invalidate(season: str = None) -> None:
+    """
+    Drops precomputed ranking tables, so the next request computes them from fresh data
+    Params:
+        season: str = None
+            only drop tables for this season (and the cumulative tables); drop everything if None
+    """
+    with connect() as con:
+        if season is None:
+            con.execute("DELETE FROM rankings")
+        else:
+            con.execute(
+                "DELETE FROM rankings WHERE season IN (?, 'all')", (str(season),)
+            )
@@ -0,0 +1,436 @@
+import argparse
+import itertools
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import data
+import elo
+import engine
+import live
+
+# how many simulated seasons each worker task runs at once
+CHUNK_SIZE = 10_000
+
+# independents have no conference to win
+INDEPENDENTS = "FBS Independents"
+
+
+def remaining_games(
+    ratings_df: DataFrame, season: int
+) -> tuple[engine.RatingState, engine.GameArrays]:
+    """
+    Loads a season's unplayed games, encoded against the ratings' team index
+
+    Parameters:
+        ratings_df: DataFrame
+            the current ratings, from live.current_ratings
+        season: int
+            the season to simulate the rest of
+
+    Returns:
+        the current rating state and the unplayed games
+    """
+    schedule_df = data.load_games(season=season, include_unplayed=True)
+    schedule_df = schedule_df[
+        schedule_df["home_points"].isna() | schedule_df["away_points"].isna()
+    ]
+    schedule_df = elo.set_fcs(ratings_df, schedule_df)
+
+    state = engine.init_state(ratings_df)
+    return state, engine.encode_games(state, schedule_df)
+
+
+def is_conference_game(
+    games: engine.GameArrays, conference_codes: np.ndarray
+) -> np.ndarray:
+    """
+    Finds the games between two members of the same conference
+
+    Parameters:
+        games: engine.GameArrays
+            the games
+        conference_codes: np.ndarray
+            every team's conference code, -1 for teams outside a conference
+
+    Returns:
+        a boolean mask of the conference games
+    """
+    home_codes = conference_codes[games.home]
+    return (home_codes >= 0) & (home_codes == conference_codes[games.away])
+
+
+def played_conference_wins(
+    ratings_df: DataFrame, season: int, conference_codes: np.ndarray
+) -> np.ndarray:
+    """
+    Counts every team's wins in the conference games already played
+
+    Parameters:
+        ratings_df: DataFrame
+            the current ratings, from live.current_ratings
+        season: int
+            the season
+        conference_codes: np.ndarray
+            every team's conference code, -1 for teams outside a conference
+
+    Returns:
+        every team's conference wins so far
+    """
+    state = engine.init_state(ratings_df)
+    games = engine.encode_games(
+        state, elo.set_fcs(ratings_df, data.load_games(season=season))
+    )
+
+    winners = np.where(games.home_points > games.away_points, games.home, games.away)
+    return np.bincount(
+        winners[is_conference_game(games, conference_codes)],
+        minlength=len(state.team_ids),
+    ).astype(np.int16)
+
+
+def simulate_chunk(
+    state: engine.RatingState,
+    games: engine.GameArrays,
+    runs: int,
+    seed: np.random.SeedSequence,
+    conference_codes: np.ndarray,
+    update_ratings: bool = False,
+    k: float = engine.K,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Plays out the remaining games of many seasons at once, drawing each result from the
+    elo.update_elo expected score
+
+    Parameters:
+        state: engine.RatingState
+            the current ratings
+        games: engine.GameArrays
+            the unplayed games
+        runs: int
+            how many seasons to simulate
+        seed: np.random.SeedSequence
+            the random seed of this chunk
+        conference_codes: np.ndarray
+            every team's conference code, -1 for teams outside a conference
+        update_ratings: bool = False
+            update every run's ratings after each simulated game, like elo.update_elo
+        k: float = engine.K
+            the K factor used when updating ratings
+
+    Returns:
+        the simulated number of additional wins and additional conference wins of every team in
+        every run, (runs x teams) each
+    """
+    rng = np.random.default_rng(seed)
+    num_teams = len(state.team_ids)
+
+    if not update_ratings:
+        # every game's probability is fixed, so all runs and games can be drawn in one step
+        elo_ratings = state.elo
+        expected_h = 1 / (
+            1 + (10 ** ((elo_ratings[games.away] - elo_ratings[games.home]) / 400))
+        )
+        home_won = rng.random((runs, len(games.home)), dtype=np.float32) < expected_h
+
+        home_onehot = np.zeros((len(games.home), num_teams), dtype=np.float32)
+        home_onehot[np.arange(len(games.home)), games.home] = 1
+        away_onehot = np.zeros((len(games.away), num_teams), dtype=np.float32)
+        away_onehot[np.arange(len(games.away)), games.away] = 1
+
+        wins = home_won.astype(np.float32) @ home_onehot
+        wins += (~home_won).astype(np.float32) @ away_onehot
+
+        in_conference = is_conference_game(games, conference_codes)
+        conference_wins = (
+            home_won[:, in_conference].astype(np.float32) @ home_onehot[in_conference]
+        )
+        conference_wins += (~home_won[:, in_conference]).astype(
+            np.float32
+        ) @ away_onehot[in_conference]
+        return wins.astype(np.int16), conference_wins.astype(np.int16)
+
+    # otherwise each run carries its own ratings through the schedule week by week
+    elo_ratings = np.tile(state.elo, (runs, 1))
+    wins = np.zeros((runs, num_teams), dtype=np.int16)
+    conference_wins = np.zeros((runs, num_teams), dtype=np.int16)
+    rows = np.arange(runs)[:, None]
+
+    for week_games in engine.iter_weeks(games):
+        for batch in engine.conflict_free_batches(week_games):
+            home_elo = elo_ratings[:, batch.home]
+            away_elo = elo_ratings[:, batch.away]
+            expected_h = 1 / (1 + (10 ** ((away_elo - home_elo) / 400)))
+            expected_a = 1 / (1 + (10 ** ((home_elo - away_elo) / 400)))
+
+            home_won = rng.random(expected_h.shape) < expected_h
+            outcome_h = home_won.astype(np.float64)
+
+            elo_ratings[:, batch.home] = np.rint(
+                home_elo + k * (outcome_h - expected_h)
+            )
+            elo_ratings[:, batch.away] = np.rint(
+                away_elo + k * ((1 - outcome_h) - expected_a)
+            )
+            wins[rows, batch.home] += home_won
+            wins[rows, batch.away] += ~home_won
+
+            in_conference = is_conference_game(batch, conference_codes)
+            conference_wins[rows, batch.home] += home_won & in_conference
+            conference_wins[rows, batch.away] += ~home_won & in_conference
+
+    return wins, conference_wins
+
+
+def summarize_chunk(
+    total_wins: np.ndarray,
+    conference_wins: np.ndarray,
+    conference_codes: np.ndarray,
+    max_wins: int,
+    is_team: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces simulated seasons to per-team win counts and conference title shares, so only
+    fixed-size results leave each worker
+
+    Parameters:
+        total_wins: np.ndarray
+            every team's final win total in every run, (runs x teams)
+        conference_wins: np.ndarray
+            every team's final conference win total in every run, (runs x teams)
+        conference_codes: np.ndarray
+            every team's conference code, -1 for teams outside a conference
+        max_wins: int
+            the largest possible win total of a real team
+        is_team: np.ndarray
+            which entries are real teams rather than the FCS placeholder, whose wins aren't counted
+
+    Returns:
+        how many runs ended with each win total for every team (teams x max_wins + 1) and how
+        many conference titles every team won, going to the most conference wins with ties
+        shared evenly
+    """
+    num_teams = total_wins.shape[1]
+    win_counts = np.zeros((num_teams, max_wins + 1), dtype=np.int64)
+    for team in np.flatnonzero(is_team):
+        win_counts[team] = np.bincount(total_wins[:, team], minlength=max_wins + 1)
+
+    titles = np.zeros(num_teams)
+    for code in np.unique(conference_codes[conference_codes >= 0]):
+        members = np.flatnonzero(conference_codes == code)
+        member_wins = conference_wins[:, members]
+        leaders = member_wins == member_wins.max(axis=1, keepdims=True)
+        titles[members] += (leaders / leaders.sum(axis=1, keepdims=True)).sum(axis=0)
+
+    return win_counts, titles
+
+
+def run_chunk(
+    state: engine.RatingState,
+    games: engine.GameArrays,
+    runs: int,
+    seed: np.random.SeedSequence,
+    update_ratings: bool,
+    conference_codes: np.ndarray,
+    conference_wins: np.ndarray,
+    is_team: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Simulates and summarizes one chunk of runs, for the process pool
+
+    Parameters:
+        state: engine.RatingState
+            the current ratings and records
+        games: engine.GameArrays
+            the unplayed games
+        runs: int
+            how many seasons to simulate
+        seed: np.random.SeedSequence
+            the random seed of this chunk
+        update_ratings: bool
+            update every run's ratings after each simulated game
+        conference_codes: np.ndarray
+            every team's conference code, -1 for teams outside a conference
+        conference_wins: np.ndarray
+            every team's conference wins so far
+        is_team: np.ndarray
+            which entries are real teams rather than the FCS placeholder
+
+    Returns:
+        the result of summarize_chunk
+    """
+    total_wins, total_conference_wins = simulate_chunk(
+        state, games, runs, seed, conference_codes, update_ratings
+    )
+    total_wins += state.wins.astype(np.int16)
+    total_conference_wins += conference_wins
+
+    remaining = np.bincount(
+        np.concatenate([games.home, games.away]), minlength=len(state.team_ids)
+    )
+    # the FCS placeholder plays every FBS team's FCS games, so its total would widen the table
+    max_wins = int((state.wins + remaining)[is_team].max())
+    return summarize_chunk(
+        total_wins, total_conference_wins, conference_codes, max_wins, is_team
+    )
+
+
+def map_chunks(
+    chunk_fn: Callable,
+    state: engine.RatingState,
+    games: engine.GameArrays,
+    runs: int,
+    chunk_size: int,
+    seed: int,
+    max_workers: int,
+    *args,
+) -> list:
+    """
+    Splits many random runs over a season's games into chunks and runs them on a process pool.
+    Every chunk gets its own child of the seed, so the results only depend on the seed and the
+    chunk size, not on how many processes there are
+
+    Parameters:
+        chunk_fn: Callable
+            called as chunk_fn(state, games, chunk_runs, chunk_seed, *args) for every chunk
+        state: engine.RatingState
+            the ratings every run starts from
+        games: engine.GameArrays
+            the games every run plays
+        runs: int
+            how many runs in total
+        chunk_size: int
+            how many runs each worker task does at once
+        seed: int
+            the random seed, None for a fresh one
+        max_workers: int
+            how many processes to use, None for the number of CPUs
+        *args:
+            passed on to every chunk_fn call
+
+    Returns:
+        every chunk's result, in chunk order
+    """
+    chunk_runs = [chunk_size] * (runs // chunk_size)
+    if runs % chunk_size:
+        chunk_runs.append(runs % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_runs))
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        return list(
+            executor.map(
+                chunk_fn,
+                itertools.repeat(state),
+                itertools.repeat(games),
+                chunk_runs,
+                seeds,
+                *[itertools.repeat(arg) for arg in args],
+            )
+        )
+
+
+def simulate_season(
+    ratings_df: DataFrame,
+    season: int,
+    runs: int = 100_000,
+    update_ratings: bool = False,
+    seed: int = None,
+    max_workers: int = None,
+) -> tuple[DataFrame, DataFrame]:
+    """
+    Projects final records and conference titles by simulating the rest of a season many times
+
+    Parameters:
+        ratings_df: DataFrame
+            the current ratings, from live.current_ratings. Not elo.get_elo_rankings, whose
+            ratings are already pulled towards the mean for the next season
+        season: int
+            the season to simulate the rest of
+        runs: int = 100_000
+            how many seasons to simulate
+        update_ratings: bool = False
+            update every run's ratings after each simulated game, like elo.update_elo
+        seed: int = None
+            the random seed, for reproducible projections
+        max_workers: int = None
+            how many processes to use, defaults to the number of CPUs
+
+    Returns:
+        a DataFrame with every team's expected wins and conference title probability, and a
+        DataFrame with the probability of every team finishing with each win total
+    """
+    state, games = remaining_games(ratings_df, season)
+    is_team = np.asarray(ratings_df.index != 9999)
+
+    # neither the FCS placeholder nor independents can win a conference
+    conference = ratings_df["Conference"].where(
+        is_team & (ratings_df["Conference"] != INDEPENDENTS)
+    )
+    conference_codes, _ = pd.factorize(conference.replace(0, np.nan))
+    conference_wins = played_conference_wins(ratings_df, season, conference_codes)
+
+    results = map_chunks(
+        run_chunk,
+        state,
+        games,
+        runs,
+        CHUNK_SIZE,
+        seed,
+        max_workers,
+        update_ratings,
+        conference_codes,
+        conference_wins,
+        is_team,
+    )
+
+    win_counts = sum(result[0] for result in results)
+    titles = sum(result[1] for result in results)
+
+    win_dist_df = DataFrame(
+        win_counts / runs,
+        index=ratings_df.index,
+        columns=range(win_counts.shape[1]),
+    )
+    win_dist_df.insert(0, "School", ratings_df["School"])
+    win_dist_df = win_dist_df.drop(index=9999, errors="ignore")
+
+    projection_df = ratings_df[["School", "Conference", "Wins", "Losses", "Elo"]].copy()
+    projection_df["Expected Wins"] = (win_counts * np.arange(win_counts.shape[1])).sum(
+        axis=1
+    ) / runs
+    projection_df["Conference Title"] = titles / runs
+    projection_df = projection_df.drop(index=9999, errors="ignore")
+
+    return (
+        projection_df.sort_values(by=["Expected Wins"], ascending=False),
+        win_dist_df,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Project the rest of a season from the current Elo ratings"
+    )
+    parser.add_argument("--season", type=int, default=data.MOST_RECENT_FULL_SEASON + 1)
+    parser.add_argument("--runs", type=int, default=100_000)
+    parser.add_argument("--update-ratings", action="store_true")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    projection_df, _ = simulate_season(
+        live.current_ratings(args.season, refresh=True),
+        args.season,
+        runs=args.runs,
+        update_ratings=args.update_ratings,
+        seed=args.seed,
+    )
+
+    print(projection_df.head(25).to_string())
+
+
+if __name__ == "__main__":
+    main()
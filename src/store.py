@@ -0,0 +1,220 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import cache
+
+# the columnar game store lives in this subdirectory of the cache directory
+STORE_SUBDIR = "store"
+
+# the dtype every stored column is downcast to, "category" columns are stored as codes plus
+# their categories. Missing values in integer columns are stored as -1
+SCHEMAS = {
+    "games": {
+        "id": np.int32,
+        "season": np.int16,
+        "week": np.int16,
+        "season_type": "category",
+        "home_id": np.int32,
+        "home_team": "category",
+        "home_points": np.int16,
+        "away_id": np.int32,
+        "away_team": "category",
+        "away_points": np.int16,
+    },
+    "teams": {"id": np.int32, "school": "category", "conference": "category"},
+    "rankings": {"rank": np.int16, "school": "category"},
+    "recruiting": {"team": "category", "points": np.float64},
+}
+
+# the table each API endpoint's data is ingested into
+ENDPOINT_TABLES = {
+    "games": "games",
+    "teams/fbs": "teams",
+    "rankings": "rankings",
+    "recruiting/teams": "recruiting",
+}
+
+# values categorical columns must be able to take later on, e.g. elo.set_fcs renames FCS opponents
+EXTRA_CATEGORIES = {"home_team": ["FCS"], "away_team": ["FCS"]}
+
+
+def table_dir(season: int, table: str) -> Path:
+    """
+    Gets the directory a table of a season is stored in
+    Params:
+        season: int
+            the season
+        table: str
+            the table, one of SCHEMAS
+    Returns:
+        the directory
+    """
+    return cache.CACHE_DIR / STORE_SUBDIR / str(season) / table
+
+
+def has_table(season: int, table: str) -> bool:
+    """
+    Checks whether a table of a season has been ingested
+    Params:
+        season: int
+            the season
+        table: str
+            the table, one of SCHEMAS
+    Returns:
+        True if read_table() will find it
+    """
+    # the column list is written last, so a half-written table doesn't count
+    return (table_dir(season, table) / "columns.json").exists()
+
+
+def covers(endpoint: str, params: dict[str, str]) -> bool:
+    """
+    Checks whether the data of an API request has been ingested, so the request can be skipped
+    Params:
+        endpoint: str
+            the API endpoint
+        params: dict[str, str]
+            a dictionary of request parameters
+    Returns:
+        True if the loaders in data.py will read the request's data from the store
+    """
+    table = ENDPOINT_TABLES.get(endpoint)
+    return table is not None and has_table(int(params["year"]), table)
+
+
+def write_table(season: int, table: str, df: DataFrame) -> None:
+    """
+    Stores a table of a season as one .npy file per column, downcast to the table's schema
+    Params:
+        season: int
+            the season
+        table: str
+            the table, one of SCHEMAS
+        df: DataFrame
+            the table, with at least the columns of the schema
+    """
+    directory = table_dir(season, table)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for column, dtype in SCHEMAS[table].items():
+        values = df[column]
+
+        if dtype == "category":
+            categories = pd.Index(values.dropna().unique()).union(
+                EXTRA_CATEGORIES.get(column, [])
+            )
+            codes = pd.Categorical(values, categories=categories).codes
+            np.save(directory / f"{column}.npy", codes)
+            np.save(directory / f"{column}.categories.npy", categories.to_numpy(str))
+        elif np.issubdtype(dtype, np.integer):
+            np.save(directory / f"{column}.npy", values.fillna(-1).to_numpy(dtype))
+        else:
+            np.save(directory / f"{column}.npy", values.to_numpy(dtype))
+
+    with open(directory / "columns.json", "w") as f:
+        json.dump(list(SCHEMAS[table]), f)
+
+
+def read_column(directory: Path, column: str, dtype) -> np.ndarray | pd.Categorical:
+    """
+    Memory-maps one stored column
+    Params:
+        directory: Path
+            the table's directory
+        column: str
+            the column
+        dtype:
+            the column's schema dtype
+    Returns:
+        the column's values, backed by the file where possible
+    """
+    values = np.load(directory / f"{column}.npy", mmap_mode="r")
+
+    if dtype == "category":
+        categories = np.load(directory / f"{column}.categories.npy")
+        return pd.Categorical.from_codes(values, categories=categories.astype(object))
+    return values
+
+
+def read_table(season: int, table: str) -> DataFrame:
+    """
+    Reads an ingested table of a season. Numeric columns are memory-mapped rather than copied,
+    so only the pages that are used get read from disk
+    Params:
+        season: int
+            the season
+        table: str
+            the table, one of SCHEMAS
+    Returns:
+        the table, with integer columns still holding -1 for missing values
+    """
+    directory = table_dir(season, table)
+
+    with open(directory / "columns.json") as f:
+        columns = json.load(f)
+
+    return DataFrame(
+        {
+            column: read_column(directory, column, SCHEMAS[table][column])
+            for column in columns
+        },
+        copy=False,
+    )
+
+
+def ingest(seasons: list[int], force: bool = False) -> list[int]:
+    """
+    Fetches every completed season's games, teams, rankings and recruiting classes through data.py
+    and writes them to the store. Seasons still being played are left to the API and the response
+    cache, since their data still changes
+    Params:
+        seasons: list[int]
+            the seasons to ingest
+        force: bool = False
+            rewrite seasons that are already in the store
+    Returns:
+        the seasons that were written
+    """
+    # data.py reads from the store, so it is only imported once the store is needed
+    import data
+
+    written = []
+    for season in seasons:
+        if not cache.is_completed_season(season):
+            continue
+        if not force and all(has_table(season, table) for table in SCHEMAS):
+            continue
+
+        write_table(season, "games", data.fetch_games(season))
+        write_table(season, "teams", data.fetch_teams(season))
+        write_table(season, "rankings", data.fetch_rankings(season))
+        write_table(season, "recruiting", data.fetch_recruiting_class(season))
+        written.append(season)
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ingest completed seasons into the local columnar store"
+    )
+    parser.add_argument("--first-season", type=int, required=True)
+    parser.add_argument("--last-season", type=int, default=None)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    import data
+
+    last_season = args.last_season or data.MOST_RECENT_FULL_SEASON
+    written = ingest(list(range(args.first_season, last_season + 1)), args.force)
+
+    print(f"ingested {len(written)} seasons into {cache.CACHE_DIR / STORE_SUBDIR}")
+
+
+if __name__ == "__main__":
+    main()
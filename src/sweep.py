@@ -0,0 +1,229 @@
+import argparse
+import itertools
+import os
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import backtest
+import data
+import elo
+import engine
+
+
+def build_grid(
+    k: Sequence[float] = (engine.K,),
+    margin_of_victory: Sequence[bool] = (False, True),
+    mov_scale: Sequence[float] = (engine.MOV_SCALE,),
+    mov_slope: Sequence[float] = (engine.MOV_SLOPE,),
+    reversion: Sequence[float] = (engine.REVERSION,),
+) -> DataFrame:
+    """
+    Builds every combination of the given Elo parameters
+
+    Parameters:
+        k: Sequence[float] = (engine.K,)
+            K factors to try
+        margin_of_victory: Sequence[bool] = (False, True)
+            whether to weight elo by margin of victory
+        mov_scale: Sequence[float] = (engine.MOV_SCALE,)
+            scale constants of the margin-of-victory multiplier to try
+        mov_slope: Sequence[float] = (engine.MOV_SLOPE,)
+            slope constants of the margin-of-victory multiplier to try
+        reversion: Sequence[float] = (engine.REVERSION,)
+            season-end mean reversion factors to try
+
+    Returns:
+        A DataFrame with one row per parameter combination
+    """
+    return DataFrame(
+        itertools.product(k, margin_of_victory, mov_scale, mov_slope, reversion),
+        columns=["k", "margin_of_victory", "mov_scale", "mov_slope", "reversion"],
+    )
+
+
+def load_history(
+    seasons: list[int],
+) -> tuple[engine.RatingState, list[engine.GameArrays]]:
+    """
+    Loads the teams and every season's games, encoded for the rating engine
+
+    Parameters:
+        seasons: list[int]
+            The seasons to load, in order
+
+    Returns:
+        The starting state and a list with the encoded games of each season
+    """
+    requests_list = [
+        ("teams/fbs", {"year": data.MOST_RECENT_FULL_SEASON}),
+        (
+            "rankings",
+            {"year": data.MOST_RECENT_FULL_SEASON, "seasonType": "postseason"},
+        ),
+    ] + [
+        ("games", {"year": season, "seasonType": season_type})
+        for season in seasons
+        for season_type in ["regular", "postseason"]
+    ]
+    data.prefetch(requests_list)
+
+    teams_df = data.load_teams()
+    state = engine.init_state(teams_df)
+    season_games = [
+        engine.encode_games(
+            state, elo.set_fcs(teams_df, data.load_games(season=season))
+        )
+        for season in seasons
+    ]
+
+    return state, season_games
+
+
+def score_grid(
+    state: engine.RatingState,
+    season_games: list[engine.GameArrays],
+    grid: DataFrame,
+    burn_in: int = 1,
+) -> DataFrame:
+    """
+    Replays the games once for every parameter combination at the same time, broadcasting the
+    ratings over a (combinations x teams) array, and scores each combination's pre-game predictions
+
+    Parameters:
+        state: engine.RatingState
+            the starting state
+        season_games: list[engine.GameArrays]
+            the encoded games of each season, in order
+        grid: DataFrame
+            the parameter combinations, as returned by build_grid
+        burn_in: int = 1
+            how many seasons to replay before starting to score predictions
+
+    Returns:
+        The grid with the number of games scored, log-loss, Brier score and accuracy added
+    """
+
+    def param(name: str) -> np.ndarray:
+        return grid[name].to_numpy()[:, None]
+
+    state = engine.RatingState(
+        team_ids=state.team_ids,
+        elo=np.tile(state.elo, (len(grid), 1)),
+        wins=state.wins.copy(),
+        losses=state.losses.copy(),
+    )
+
+    # summed games, log-loss, Brier score and correct picks of every combination
+    totals = np.zeros((len(backtest.SCORE_COLUMNS), len(grid)))
+
+    def on_batch(batch: engine.GameArrays, expected_h: np.ndarray) -> None:
+        totals[:] += backtest.score_batch(expected_h, batch)
+
+    for i, games in enumerate(season_games):
+        engine.reset_record(state)
+
+        for week_games in engine.iter_weeks(games):
+            engine.replay_week(
+                state,
+                week_games,
+                param("margin_of_victory"),
+                param("k"),
+                param("mov_scale"),
+                param("mov_slope"),
+                on_batch=on_batch if i >= burn_in else None,
+            )
+
+        engine.revert_state_to_mean(state, param("reversion"))
+
+    scored_df = grid.copy()
+    for column, column_totals in zip(backtest.SCORE_COLUMNS, totals):
+        scored_df[column] = column_totals
+
+    return backtest.finish(scored_df)
+
+
+def sweep(
+    seasons: list[int] = None,
+    grid: DataFrame = None,
+    burn_in: int = 1,
+    max_workers: int = None,
+) -> DataFrame:
+    """
+    Scores every parameter combination against history, splitting the grid across processes
+
+    Parameters:
+        seasons: list[int] = None
+            The seasons to replay, defaults to the seasons of the cumulative rankings
+        grid: DataFrame = None
+            The parameter combinations, defaults to build_grid()
+        burn_in: int = 1
+            how many seasons to replay before starting to score predictions
+        max_workers: int = None
+            how many processes to use, defaults to the number of CPUs
+
+    Returns:
+        The scored grid, best log-loss first
+    """
+    if seasons is None:
+        seasons = list(elo.build_season_list("all"))
+    if grid is None:
+        grid = build_grid()
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    state, season_games = load_history(seasons)
+
+    chunks = [
+        grid.iloc[idx]
+        for idx in np.array_split(np.arange(len(grid)), min(max_workers, len(grid)))
+    ]
+
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        scored = executor.map(
+            score_grid,
+            itertools.repeat(state),
+            itertools.repeat(season_games),
+            chunks,
+            itertools.repeat(burn_in),
+        )
+        scored_df = pd.concat(list(scored))
+
+    return scored_df.sort_values(by=["log_loss"]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score Elo parameter combinations against past seasons"
+    )
+    parser.add_argument("--k", type=float, nargs="+", default=[engine.K])
+    parser.add_argument(
+        "--mov-scale", type=float, nargs="+", default=[engine.MOV_SCALE]
+    )
+    parser.add_argument(
+        "--mov-slope", type=float, nargs="+", default=[engine.MOV_SLOPE]
+    )
+    parser.add_argument(
+        "--reversion", type=float, nargs="+", default=[engine.REVERSION]
+    )
+    parser.add_argument("--burn-in", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    grid = build_grid(
+        k=args.k,
+        mov_scale=args.mov_scale,
+        mov_slope=args.mov_slope,
+        reversion=args.reversion,
+    )
+    scored_df = sweep(grid=grid, burn_in=args.burn_in, max_workers=args.workers)
+
+    print(scored_df.head(args.top).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import json
+
+import numpy as np
+
+import cache
+
+CONFERENCES = [
+    "ACC",
+    "American Athletic",
+    "Big 10",
+    "Big 12",
+    "Conference USA",
+    "FBS Independents",
+    "Mid American",
+    "Mountain West",
+    "Pac 12",
+    "SEC",
+    "Sun Belt",
+]
+
+# FCS opponents get IDs from here up, FBS teams are numbered 1..num_teams
+FCS_ID_START = 100000
+
+
+def team_strengths(num_teams: int, seed: int = 0) -> np.ndarray:
+    """
+    Draws a hidden strength for every team, which drives game results, rankings and recruiting
+
+    Parameters:
+        num_teams: int
+            how many FBS teams there are
+        seed: int = 0
+            the random seed
+
+    Returns:
+        an array of strengths in elo-like points around 0
+    """
+    return np.random.default_rng(seed).normal(0, 150, num_teams)
+
+
+def teams_payload(num_teams: int) -> list[dict]:
+    """
+    Generates a response of the teams/fbs endpoint
+
+    Parameters:
+        num_teams: int
+            how many FBS teams there are
+
+    Returns:
+        the JSON response as Python objects
+    """
+    return [
+        {
+            "id": team_id,
+            "school": f"School {team_id}",
+            "mascot": f"Mascot {team_id}",
+            "abbreviation": f"S{team_id}",
+            "conference": CONFERENCES[team_id % len(CONFERENCES)],
+            "division": None,
+            "color": "#000000",
+            "logos": [f"http://example.com/{team_id}.png"],
+            "location": {"venue_id": team_id, "name": f"Stadium {team_id}"},
+        }
+        for team_id in range(1, num_teams + 1)
+    ]
+
+
+def games_payload(
+    season: int, season_type: str, num_teams: int, seed: int = 0
+) -> list[dict]:
+    """
+    Generates a response of the games endpoint. Most weeks every team plays once, some teams play an
+    FCS opponent and now and then a team plays twice in a week
+
+    Parameters:
+        season: int
+            the season
+        season_type: str
+            "regular" or "postseason"
+        num_teams: int
+            how many FBS teams there are
+        seed: int = 0
+            the random seed
+
+    Returns:
+        the JSON response as Python objects
+    """
+    postseason = season_type == "postseason"
+    rng = np.random.default_rng([seed, season, postseason])
+    strengths = team_strengths(num_teams, seed)
+
+    weeks = [1] if postseason else range(1, 15)
+    next_id = season * 100000 + (50000 if postseason else 0)
+
+    games = []
+    for week in weeks:
+        teams = rng.permutation(num_teams) + 1
+        # only about half the teams make a bowl
+        if postseason:
+            teams = teams[: num_teams // 2]
+
+        pairs = list(zip(teams[0::2].tolist(), teams[1::2].tolist()))
+        if not postseason:
+            for team in rng.choice(teams, size=num_teams // 40, replace=False):
+                pairs.append((int(team), FCS_ID_START + int(rng.integers(0, 2000))))
+            # a team playing twice in a week
+            if rng.random() < 0.2:
+                pairs.append((pairs[0][0], pairs[1][1]))
+
+        for home_id, away_id in pairs:
+            if rng.random() < 0.5:
+                home_id, away_id = away_id, home_id
+
+            home_strength = strengths[home_id - 1] if home_id < FCS_ID_START else -300
+            away_strength = strengths[away_id - 1] if away_id < FCS_ID_START else -300
+            margin = (home_strength - away_strength) / 25 + 3 + rng.normal(0, 14)
+            base = rng.integers(7, 35)
+
+            next_id += 1
+            games.append(
+                {
+                    "id": next_id,
+                    "season": season,
+                    "week": week,
+                    "season_type": season_type,
+                    "start_date": f"{season}-09-01T19:00:00.000Z",
+                    "neutral_site": postseason,
+                    "conference_game": False,
+                    "attendance": int(rng.integers(10000, 100000)),
+                    "venue_id": home_id,
+                    "venue": f"Stadium {home_id}",
+                    "home_id": home_id,
+                    "home_team": f"School {home_id}",
+                    "home_conference": None,
+                    "home_points": int(max(base + margin, 0)),
+                    "home_line_scores": rng.integers(0, 14, 4).tolist(),
+                    "home_post_win_prob": float(rng.random()),
+                    "away_id": away_id,
+                    "away_team": f"School {away_id}",
+                    "away_conference": None,
+                    "away_points": int(base),
+                    "away_line_scores": rng.integers(0, 14, 4).tolist(),
+                    "away_post_win_prob": float(rng.random()),
+                    "excitement_index": float(rng.random() * 10),
+                    "highlights": None,
+                    "notes": None,
+                }
+            )
+
+    return games
+
+
+def rankings_payload(season: int, num_teams: int, seed: int = 0) -> list[dict]:
+    """
+    Generates a postseason response of the rankings endpoint, with the AP Top 25 taken from
+    the hidden strengths
+
+    Parameters:
+        season: int
+            the season
+        num_teams: int
+            how many FBS teams there are
+        seed: int = 0
+            the random seed
+
+    Returns:
+        the JSON response as Python objects
+    """
+    top_25 = np.argsort(-team_strengths(num_teams, seed))[:25] + 1
+
+    return [
+        {
+            "season": season,
+            "seasonType": "postseason",
+            "week": 1,
+            "polls": [
+                {
+                    "poll": "AP Top 25",
+                    "ranks": [
+                        {
+                            "rank": rank,
+                            "school": f"School {team_id}",
+                            "conference": CONFERENCES[team_id % len(CONFERENCES)],
+                            "firstPlaceVotes": 0,
+                            "points": 1600 - 60 * rank,
+                        }
+                        for rank, team_id in enumerate(top_25.tolist(), start=1)
+                    ],
+                }
+            ],
+        }
+    ]
+
+
+def recruiting_payload(season: int, num_teams: int, seed: int = 0) -> list[dict]:
+    """
+    Generates a response of the recruiting/teams endpoint. Points come back as strings, like the API
+
+    Parameters:
+        season: int
+            the recruiting class year
+        num_teams: int
+            how many FBS teams there are
+        seed: int = 0
+            the random seed
+
+    Returns:
+        the JSON response as Python objects
+    """
+    rng = np.random.default_rng([seed, season])
+    points = 200 + team_strengths(num_teams, seed) / 3 + rng.normal(0, 20, num_teams)
+    order = np.argsort(-points)
+
+    return [
+        {
+            "year": season,
+            "rank": rank,
+            "team": f"School {team + 1}",
+            "points": f"{points[team]:.2f}",
+        }
+        for rank, team in enumerate(order.tolist(), start=1)
+    ]
+
+
+def populate_cache(
+    seasons: list[int],
+    num_teams: int = 130,
+    seed: int = 0,
+) -> int:
+    """
+    Writes synthetic responses for every endpoint into the response cache, so the loaders in data.py
+    can run offline (with cache.OFFLINE set) exactly as they would against the API
+
+    Parameters:
+        seasons: list[int]
+            the seasons to generate games, teams and rankings for (recruiting also covers the 4
+            years before the first season)
+        num_teams: int = 130
+            how many FBS teams there are
+        seed: int = 0
+            the random seed
+
+    Returns:
+        the total size of the generated responses in bytes
+    """
+    responses = []
+    for season in seasons:
+        responses += [
+            ("teams/fbs", {"year": season}, teams_payload(num_teams)),
+            (
+                "rankings",
+                {"year": season, "seasonType": "postseason"},
+                rankings_payload(season, num_teams, seed),
+            ),
+        ]
+        for season_type in ["regular", "postseason"]:
+            responses.append(
+                (
+                    "games",
+                    {"year": season, "seasonType": season_type},
+                    games_payload(season, season_type, num_teams, seed),
+                )
+            )
+
+    for season in range(min(seasons) - 4, max(seasons) + 1):
+        responses.append(
+            (
+                "recruiting/teams",
+                {"year": season},
+                recruiting_payload(season, num_teams, seed),
+            )
+        )
+
+    total_bytes = 0
+    for endpoint, params, payload in responses:
+        text = json.dumps(payload)
+        total_bytes += len(text)
+        cache.put(endpoint, params, text)
+
+    return total_bytes
@@ -0,0 +1,110 @@
+import logging
+import os
+import threading
+
+# start the warm-up worker when the app boots with CFB_WARMUP=1
+ENABLED = os.getenv("CFB_WARMUP", "0") == "1"
+
+logger = logging.getLogger("college_football_elo.warmup")
+
+# the app's sidebar pages, as memo.get_rankings options
+PAGES = {
+    "reg": {"margin_of_victory": False, "recruiting": False, "conference": False},
+    "cum": None,
+    "mov": {"margin_of_victory": True, "recruiting": False, "conference": False},
+    "recruit": {"margin_of_victory": False, "recruiting": True, "conference": False},
+    "conf": {"margin_of_victory": False, "recruiting": False, "conference": True},
+}
+
+_lock = threading.Lock()
+_thread: threading.Thread = None
+
+# (page, season) of every view the worker has computed, "all" is the cumulative page's season
+_warm: set[tuple[str, str]] = set()
+
+
+def plan_views(seasons: list[str]) -> list[tuple[str, str]]:
+    """
+    Orders the app's views by how likely they are to be opened: every page of the latest season
+    first, then the older seasons from newest to oldest
+    Params:
+        seasons: list[str]
+            the seasons offered in the app, oldest first
+    Returns:
+        (page, season) pairs, the cumulative page's season is "all"
+    """
+    views = []
+    for season in reversed(seasons):
+        for page, options in PAGES.items():
+            if options is None:
+                # the cumulative page has no season box
+                if season == seasons[-1]:
+                    views.append((page, "all"))
+            else:
+                views.append((page, season))
+    return views
+
+
+def warm(views: list[tuple[str, str]]) -> None:
+    """
+    Computes views one by one into the shared memo. A view that fails is logged and skipped, the
+    page will compute it again when it's opened
+    Params:
+        views: list[tuple[str, str]]
+            the (page, season) pairs to compute
+    """
+    # the rating engine and its dependencies are only imported here, off the app's first run
+    import memo
+
+    for page, season in views:
+        try:
+            memo.get_rankings(season=season, **(PAGES[page] or {}))
+        except Exception:
+            logger.exception("warming up %s %s failed", page, season)
+            continue
+        with _lock:
+            _warm.add((page, season))
+
+
+def start(seasons: list[str]) -> threading.Thread:
+    """
+    Starts the warm-up worker in a daemon thread, once per process however many sessions call this
+    Params:
+        seasons: list[str]
+            the seasons offered in the app, oldest first
+    Returns:
+        the worker thread
+    """
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(
+                target=warm, args=(plan_views(seasons),), name="warmup", daemon=True
+            )
+            _thread.start()
+        return _thread
+
+
+def is_warm(page: str, season: str) -> bool:
+    """
+    Checks whether the worker has computed a view
+    Params:
+        page: str
+            the sidebar page
+        season: str
+            the season, "all" for the cumulative page
+    Returns:
+        True if the view is in the memo
+    """
+    with _lock:
+        return (page, season) in _warm
+
+
+def is_running() -> bool:
+    """
+    Checks whether the worker is still computing views
+    Returns:
+        True until every view has been computed
+    """
+    with _lock:
+        return _thread is not None and _thread.is_alive()
@@ -0,0 +1,217 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import data
+import elo
+import engine
+import memo
+
+# how many seasons' snapshots are kept in memory at once
+MAX_ENTRIES = 8
+
+
+@dataclass
+class SeasonReplay:
+    """
+    Everything needed to replay part of a season again
+
+    Attributes:
+        teams_df: DataFrame
+            the teams, with their priors
+        game_ids: np.ndarray
+            each game's ID, in the order of games
+        games: engine.GameArrays
+            the season's games
+        snapshots: engine.WeekSnapshots
+            the state before the first week and after every week
+    """
+
+    teams_df: DataFrame
+    game_ids: np.ndarray
+    games: engine.GameArrays
+    snapshots: engine.WeekSnapshots
+
+
+# season replays as (fingerprint, replay) by (season, conference, recruiting, margin_of_victory)
+_replays = memo.BoundedCache(MAX_ENTRIES)
+
+
+def get_replay(
+    season: int,
+    conference: bool = False,
+    recruiting: bool = False,
+    margin_of_victory: bool = False,
+) -> SeasonReplay:
+    """
+    Replays a season once, keeping a snapshot after every week, and memoizes it. The replay is
+    redone whenever the season's teams, priors or games change, e.g. when new weeks are played
+
+    Parameters:
+        season: int
+            the season
+        conference: bool = False
+            Optionally weight elo by conference
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+
+    Returns:
+        the season's replay
+    """
+    key = (int(season), conference, recruiting, margin_of_victory)
+    fingerprint = elo.rankings_fingerprint(
+        str(season), conference, recruiting, margin_of_victory
+    )
+
+    entry = _replays.get(key)
+    if entry is not None and entry[0] == fingerprint:
+        return entry[1]
+
+    teams_df = elo.build_teams_df(str(season), conference, recruiting)
+    state = engine.init_state(teams_df)
+
+    games_df = elo.set_fcs(teams_df, data.load_games(season=int(season)))
+    games = engine.encode_games(state, games_df)
+    replay = SeasonReplay(
+        teams_df=teams_df,
+        game_ids=games_df["id"].to_numpy(),
+        games=games,
+        snapshots=engine.replay_snapshots(state, games, margin_of_victory),
+    )
+
+    _replays.put(key, (fingerprint, replay))
+
+    return replay
+
+
+def apply_overrides(
+    replay: SeasonReplay, overrides: list[dict]
+) -> tuple[engine.GameArrays, np.ndarray]:
+    """
+    Changes the results of some games
+
+    Parameters:
+        replay: SeasonReplay
+            the season's replay
+        overrides: list[dict]
+            one dict per game with its "id" and either new "home_points" and "away_points" or the
+            team ID of the "winner". A new winner gets the old winner's score and vice versa
+
+    Returns:
+        a copy of the games with the new results, and the positions of the changed games
+    """
+    games = engine.take_games(replay.games, slice(None))
+    games.home_points = games.home_points.copy()
+    games.away_points = games.away_points.copy()
+
+    game_index = pd.Index(replay.game_ids)
+    changed = []
+    for override in overrides:
+        i = game_index.get_indexer([override["id"]])[0]
+        if i < 0:
+            raise Exception(f"no game with ID {override['id']} in this season")
+
+        if "winner" in override:
+            winner = replay.teams_df.index.get_indexer([override["winner"]])[0]
+            if winner not in (games.home[i], games.away[i]):
+                raise Exception(
+                    f"team {override['winner']} didn't play in game {override['id']}"
+                )
+            high = max(games.home_points[i], games.away_points[i])
+            low = min(games.home_points[i], games.away_points[i])
+            # a tie counts as an away win, so a home winner needs an actual lead
+            if winner == games.home[i] and high == low:
+                high += 1
+            if winner == games.home[i]:
+                games.home_points[i], games.away_points[i] = high, low
+            else:
+                games.home_points[i], games.away_points[i] = low, high
+        else:
+            games.home_points[i] = override["home_points"]
+            games.away_points[i] = override["away_points"]
+
+        changed.append(i)
+
+    return games, np.array(changed, dtype=np.int64)
+
+
+def rankings_table(state: engine.RatingState, teams_df: DataFrame) -> DataFrame:
+    """
+    Turns an end-of-season state into the table get_elo_rankings returns
+
+    Parameters:
+        state: engine.RatingState
+            the state after the last week, before mean reversion
+        teams_df: DataFrame
+            the teams the state was built from
+
+    Returns:
+        the rankings
+    """
+    engine.revert_state_to_mean(state)
+    return engine.state_to_df(state, teams_df)
+
+
+def what_if(
+    season: int,
+    overrides: list[dict],
+    conference: bool = False,
+    recruiting: bool = False,
+    margin_of_victory: bool = False,
+) -> DataFrame:
+    """
+    Ranks a season as if some games had ended differently. The replay resumes from the snapshot
+    just before the earliest changed week, so a late-season change only replays the last weeks
+
+    Parameters:
+        season: int
+            the season
+        overrides: list[dict]
+            the changed results, see apply_overrides
+        conference: bool = False
+            Optionally weight elo by conference
+        recruiting: bool = False
+            Optionally weight elo by recruiting rank
+        margin_of_victory: bool = False
+            Optionally weight elo by margin of victory
+
+    Returns:
+        every team's what-if Elo, record and rank next to the real ones, best what-if Elo first
+    """
+    replay = get_replay(season, conference, recruiting, margin_of_victory)
+    snapshots = replay.snapshots
+    games, changed = apply_overrides(replay, overrides)
+
+    # the earliest week, in replay order, that any changed game is in
+    start = int(np.isin(snapshots.weeks, games.week[changed]).argmax())
+
+    state = engine.init_state(replay.teams_df)
+    engine.replay_snapshots(state, games, margin_of_victory, snapshots, start=start)
+    what_if_df = rankings_table(state, replay.teams_df)
+
+    real = engine.RatingState(
+        team_ids=state.team_ids,
+        elo=snapshots.elo[-1].copy(),
+        wins=snapshots.wins[-1],
+        losses=snapshots.losses[-1],
+    )
+    real_df = rankings_table(real, replay.teams_df)
+
+    diff_df = what_if_df[["School", "Wins", "Losses", "Elo"]].copy()
+    diff_df["Rank"] = diff_df["Elo"].rank(ascending=False, method="min").astype(int)
+    diff_df["Real Wins"] = real_df["Wins"]
+    diff_df["Real Losses"] = real_df["Losses"]
+    diff_df["Real Elo"] = real_df["Elo"]
+    diff_df["Real Rank"] = (
+        real_df["Elo"].rank(ascending=False, method="min").astype(int)
+    )
+    diff_df["Elo Change"] = diff_df["Elo"] - diff_df["Real Elo"]
+    diff_df["Rank Change"] = diff_df["Real Rank"] - diff_df["Rank"]
+
+    return diff_df.drop(index=9999, errors="ignore").sort_values(
+        by=["Elo"], ascending=False
+    )
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the app's modules import each other by name from src/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,49 @@
+import time
+import zlib
+from datetime import datetime
+
+import pytest
+
+import cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "OFFLINE", False)
+    return tmp_path
+
+
+def insert(endpoint: str, params: dict[str, str], fetched_at: float, payload: str):
+    with cache.connect() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+            (
+                cache.make_key(endpoint, params),
+                fetched_at,
+                zlib.compress(payload.encode("utf-8")),
+            ),
+        )
+
+
+def test_response_fetched_during_season_expires(cache_dir):
+    params = {"year": "2015", "seasonType": "regular"}
+    insert("games", params, datetime(2015, 12, 1).timestamp(), "[]")
+
+    assert not cache.is_fresh(params, datetime(2015, 12, 1).timestamp())
+    assert cache.get("games", params) is None
+
+
+def test_response_fetched_after_season_never_expires(cache_dir):
+    params = {"year": "2015", "seasonType": "regular"}
+    insert("games", params, datetime(2016, 3, 1).timestamp(), "[]")
+
+    assert cache.is_fresh(params, datetime(2016, 3, 1).timestamp())
+    assert cache.get("games", params) == "[]"
+
+
+def test_recent_response_is_fresh(cache_dir):
+    params = {"year": str(datetime.now().year)}
+    insert("games", params, time.time(), "[]")
+
+    assert cache.get("games", params) == "[]"
@@ -0,0 +1,39 @@
+import pandas as pd
+from pandas import DataFrame
+
+import cache
+import checkpoints
+import engine
+import store
+
+
+def test_store_and_api_games_share_a_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+
+    teams_df = DataFrame(
+        {"Elo": [1500.0, 1500.0, 1500.0], "Wins": 0, "Losses": 0},
+        index=pd.Index([1, 2, 9999], name="id"),
+    )
+    api_games_df = DataFrame(
+        {
+            "id": [10, 11, 12],
+            "season": 2015,
+            "week": [1, 1, 2],
+            "season_type": "regular",
+            "home_id": [1, 2, 1],
+            "home_team": ["A", "B", "A"],
+            "home_points": [21, 14, 35],
+            "away_id": [2, 9999, 2],
+            "away_team": ["B", "FCS", "B"],
+            "away_points": [17, 3, 38],
+        }
+    )
+    store.write_table(2015, "games", api_games_df)
+    store_games_df = store.read_table(2015, "games")
+    assert store_games_df["week"].dtype != api_games_df["week"].dtype
+
+    state = engine.init_state(teams_df)
+    key = checkpoints.initial_key(state, margin_of_victory=False)
+    assert checkpoints.season_key(
+        key, 2015, engine.encode_games(state, api_games_df)
+    ) == checkpoints.season_key(key, 2015, engine.encode_games(state, store_games_df))